@@ -0,0 +1,230 @@
+#!/usr/bin/python -tt
+
+"""
+    mcBench measures how long the stages of mcStats take and how much
+    memory they need. The projet is housed at
+    <https://github.com/85pando/mcStats>.
+
+    Copyright (C) 2014 Stephan Heidinger
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+# import modules used here
+import sys
+import os
+import time
+import shutil
+import resource
+import tempfile
+import cPickle
+import datetime
+import traceback
+
+import mcStats
+import mcLogGen
+from mcStats import FontStyle
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def peak_memory():
+  """
+  peak_memory gives the peak resident memory of this process in kilobytes.
+  """
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def run_stage(prepare, stage):
+  """
+  run_stage measures a single stage in a child process, s.t. the peak memory of one stage does not hide the one of the next stage.
+  prepare - a function giving the input of the stage, it is not measured
+  stage - a function taking the input and doing the work that is measured
+  Returns a tuple (wall time, cpu time, peak memory, additional peak memory), times in seconds and memory in kilobytes.
+  An exception in the child process is raised again in the parent, after the traceback of the child is printed.
+  """
+  read_end, write_end = os.pipe()
+  pid = os.fork()
+  if pid == 0:
+    # child process, measure the stage and send the result (or the exception) to the parent
+    os.close(read_end)
+    try:
+      data = prepare()
+      memory_before = peak_memory()
+      cpu_before = time.clock()
+      wall_before = time.time()
+      stage(data)
+      result = (None, (time.time() - wall_before, time.clock() - cpu_before, peak_memory(), peak_memory() - memory_before))
+    except Exception, error:
+      result = (traceback.format_exc(), error)
+    try:
+      data = cPickle.dumps(result)
+    except Exception:
+      # not every exception can be pickled, the traceback is enough to tell what went wrong
+      data = cPickle.dumps((result[0], RuntimeError(repr(result[1]))))
+    os.write(write_end, data)
+    os.close(write_end)
+    os._exit(0)
+  os.close(write_end)
+  result = ''
+  chunk = os.read(read_end, 4096)
+  while chunk:
+    result += chunk
+    chunk = os.read(read_end, 4096)
+  os.close(read_end)
+  os.waitpid(pid, 0)
+  if not result:
+    raise RuntimeError('the child process measuring the stage ended without a result')
+  child_traceback, result = cPickle.loads(result)
+  if child_traceback is not None:
+    sys.stderr.write(FontStyle.bold + 'run_stage:\n\t' + FontStyle.normal + 'the stage failed in the child process:\n' + child_traceback)
+    raise result
+  return result
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def count_lines(filenames):
+  """
+  count_lines gives the number of lines and the number of bytes of the (unpacked) logfiles.
+  """
+  lines = 0
+  size = 0
+  for filename, file_date, logfile in mcStats.stream_logfiles(filenames):
+    for line in logfile:
+      lines += 1
+      size += len(line) + 1
+  return lines, size
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def consume(stream):
+  """
+  consume reads all lines given by stream_logfiles.
+  """
+  for filename, file_date, lines in stream:
+    for line in lines:
+      pass
+
+
+def render(aggregator):
+  """
+  render creates the html output for all statistics in aggregator, like main does for --write.
+  """
+  sections = [mcStats.new_section('Chat', '', aggregator.get_chats()),
+              mcStats.new_section('Deaths', '', aggregator.get_deaths()),
+              mcStats.new_section('Logins', '', aggregator.get_logins()),
+              mcStats.new_section('Online Time', '', aggregator.get_online_time())]
+  content = {"title": mcStats._NAME, "generator": mcStats._NAME, "generated_at": datetime.datetime.now().ctime(), "sections": sections}
+  return mcStats.render_html(content)
+
+
+def stages(filenames, jobs):
+  """
+  stages gives the stages of mcStats which are measured as a list of (name, prepare, stage), see run_stage.
+  filenames - the logfiles to use
+  jobs - the number of processes for the parallel stage, no parallel stage if less than 2
+  """
+  read = lambda: mcStats.read_logfiles(filenames)
+  purged = lambda: mcStats.purge_chat(read())
+  nothing = lambda: None
+  all_statistics = lambda data: mcStats.process_logfiles(filenames, True, True, True, True)
+  result = [('read_logfiles', nothing, lambda data: read()),
+            ('stream_logfiles', nothing, lambda data: consume(mcStats.stream_logfiles(filenames))),
+            ('purge_chat', read, mcStats.purge_chat),
+            ('process_chats', lambda: purged()[1], mcStats.process_chats),
+            ('process_deaths', lambda: purged()[0], mcStats.process_deaths),
+            ('process_logins', lambda: purged()[0], mcStats.process_logins),
+            ('process_online_time', lambda: purged()[0], mcStats.process_online_time),
+            ('process_logfiles', nothing, all_statistics)]
+  if jobs > 1:
+    result.append(('process_logfiles --jobs %d' % jobs, nothing,
+                   lambda data: mcStats.process_logfiles(filenames, True, True, True, True, jobs=jobs)))
+  result.append(('render_html', lambda: all_statistics(None), render))
+  return result
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def benchmark(filenames, jobs=1):
+  """
+  benchmark measures all stages of mcStats on filenames and prints the results.
+  filenames - the logfiles to use
+  jobs - the number of processes for the parallel stage
+  """
+  lines, size = count_lines(filenames)
+  print FontStyle.bold + 'Benchmark:' + FontStyle.normal
+  print '\t%d logfiles, %d lines, %.1f MB' % (len(filenames), lines, size / 1048576.0)
+  print '\t%-28s %9s %9s %12s %11s %11s' % ('stage', 'wall [s]', 'cpu [s]', 'lines/s', 'peak [MB]', '+peak [MB]')
+  for name, prepare, stage in stages(filenames, jobs):
+    wall, cpu, memory, memory_added = run_stage(prepare, stage)
+    print '\t%-28s %9.3f %9.3f %12.0f %11.1f %11.1f' % (name, wall, cpu, lines / max(wall, 1e-9), memory / 1024.0, memory_added / 1024.0)
+  return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def print_help():
+  """
+  print_help will display usage instructions for mcBench. It will stop the program after printing.
+  """
+  print 'Minecraft Statistics Benchmark - Usage'
+  print FontStyle.bold + 'mcBench' + FontStyle.normal, '[--help] [--jobs N] [--keep directory] [options of mcLogGen]', FontStyle.bold + '[file|directory|pattern ...]' + FontStyle.normal
+  print '\tIf no logfiles are given, synthetic logs are created with mcLogGen, see there for the options.'
+  print FontStyle.bold + '\t--jobs N' + FontStyle.normal
+  print '\t\tAlso measure process_logfiles with N processes.'
+  print FontStyle.bold + '\t--keep directory' + FontStyle.normal
+  print '\t\tWrite the synthetic logs to directory and keep them, by default they are removed afterwards.'
+  exit(0)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def main():
+  args = sys.argv[1:]
+  if '-h' in args or '--help' in args:
+    print_help()
+  jobs = 1
+  if '--jobs' in args:
+    index = args.index('--jobs')
+    jobs = int(args[index + 1])
+    del args[index+1] # number of jobs
+    del args[index] # --jobs
+  keep = None
+  if '--keep' in args:
+    index = args.index('--keep')
+    keep = args[index + 1]
+    del args[index+1] # directory
+    del args[index] # --keep
+  options = mcLogGen.parse_options(args)
+  if args:
+    # directories and patterns are expanded like mcStats does
+    benchmark(mcStats.find_logfiles(args), jobs)
+    return
+  # no logfiles given, create some
+  directory = keep or tempfile.mkdtemp(prefix='mcBench')
+  try:
+    filenames = mcLogGen.generate_logs(directory, options)
+    benchmark(filenames, jobs)
+  finally:
+    if not keep:
+      shutil.rmtree(directory)
+
+
+# standard boilerplate
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,279 @@
+#!/usr/bin/python -tt
+
+"""
+    mcLogGen creates synthetic minecraft server logs, which can be used to
+    test and benchmark mcStats. The projet is housed at
+    <https://github.com/85pando/mcStats>.
+
+    Copyright (C) 2014 Stephan Heidinger
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+# import modules used here
+import sys
+import os
+import gzip
+import random
+import datetime
+
+from mcStats import FontStyle, read_deathlist
+
+# mobs and items used to fill the gaps in the death messages
+mobs = ['Zombie', 'Skeleton', 'Creeper', 'Spider', 'Enderman', 'Blaze', 'Ghast', 'Witch']
+items = ['Diamond Sword', 'Iron Sword', 'Bow', 'Diamond Hoe']
+
+
+class LogOptions:
+  """
+  The LogOptions class includes the settings for the synthetic logs, the defaults give a small but busy server.
+  """
+  def __init__(self):
+    pass
+
+  # first day of the logs and number of days
+  start_date = datetime.date(2014, 3, 1)
+  days = 7
+  # number of different players
+  players = 50
+  # mean time a player is online and offline, in minutes
+  session_length = 45
+  offline_length = 240
+  # chat messages and deaths of an online player, per minute
+  chat_rate = 0.5
+  death_rate = 0.05
+  # mean time the server runs until it is restarted, in hours
+  run_length = 10
+  # probability that the server crashes instead of stopping cleanly
+  crash_rate = 0.2
+  # write .log.gz instead of .log files
+  compress = True
+  # seed for the random numbers, the same seed gives the same logs
+  seed = 42
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def format_time(seconds):
+  """
+  format_time gives the header of a log line written at seconds (since midnight of the first day) by the server thread.
+  """
+  seconds %= 86400
+  return '[%02d:%02d:%02d] [Server thread/INFO]: ' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def death_message(deathline, rand, players):
+  """
+  death_message fills the gaps in a message from the deathlist with names of mobs, players or items, e.g. 'was slain by  using' becomes 'was slain by Zombie using Iron Sword'.
+  """
+  killer = rand.choice(mobs + players)
+  message = deathline.replace('  using', ' ' + killer + ' using')
+  message = message.replace(' )', ' ' + killer + ')')
+  if message.endswith(' using'):
+    message += ' ' + rand.choice(items)
+  for ending in (' by', ' escape', ' fighting', ' hurt'):
+    if message.endswith(ending):
+      message += ' ' + killer
+  return message
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def generate_run(start, end, crash, options, rand, players, deathlist):
+  """
+  generate_run creates the lines of a single server run, i.e. a single logfile.
+  start, end - the time the server starts and stops, in seconds since midnight of the day of the logfile
+  crash - if True, the server crashes at end and does not write any stop message
+  Returns a list of lines.
+  """
+  # events is a list of (time, order, message), order keeps messages of the same second in order
+  events = []
+  order = [0]
+
+  def add(time, message):
+    order[0] += 1
+    events.append((time, order[0], format_time(time) + message))
+
+  add(start, 'Starting minecraft server version 1.7.2')
+  add(start, 'Loading properties')
+  add(start, 'Default game type: SURVIVAL')
+  add(start + 1, 'Starting Minecraft server on 192.168.0.1:25565')
+  add(start + 1, 'Preparing level "world"')
+  add(start + 12, 'Done (11,234s)! For help, type "help" or "?"')
+  entity_id = 100
+  for player in players:
+    # each player is offline for a while, then online for a while, until the server stops
+    time = start + 15 + int(rand.expovariate(1.0 / (options.offline_length * 60)))
+    while time < end:
+      length = max(1, int(rand.expovariate(1.0 / (options.session_length * 60))))
+      entity_id += rand.randint(1, 1000)
+      order[0] += 1
+      events.append((time, order[0], format_time(time).replace('Server thread', 'User Authenticator #1')
+                     + 'UUID of player %s is %032x' % (player, hash(player) & (2 ** 128 - 1))))
+      add(time, '%s[/192.168.0.%d:%d] logged in with entity id %d at (-186.5, 64.0, 257.5)'
+          % (player, rand.randint(2, 254), rand.randint(40000, 60000), entity_id))
+      add(time, '%s joined the game' % player)
+      if time + length >= end:
+        # player is online until the server stops
+        length = end - time
+      # chats, emotes and deaths while online
+      minute = time
+      while minute < time + length:
+        # the second within this minute, but not after the player has left
+        second = min(minute + rand.randint(0, 59), time + length)
+        if rand.random() < options.chat_rate:
+          if rand.random() < 0.9:
+            add(second, '<%s> %s' % (player, rand.choice(['hi', 'anyone got iron?', 'brb', 'nice game', 'lol'])))
+          else:
+            add(second, '* %s %s' % (player, rand.choice(['waves', 'is afk', 'laughs'])))
+        if rand.random() < options.death_rate:
+          add(second, '%s %s' % (player, death_message(rand.choice(deathlist), rand, players)))
+        minute += 60
+      time += length
+      if time >= end:
+        break
+      # player leaves, is kicked or loses the connection
+      part = rand.random()
+      if part < 0.05:
+        add(time, "Kicked %s from the game: 'You have been idle for too long!'" % player)
+        add(time, "%s lost connection: TextComponent{text='You have been idle for too long!'}" % player)
+      elif part < 0.15:
+        add(time, "%s lost connection: TextComponent{text='Disconnected'}" % player)
+      add(time, '%s left the game' % player)
+      time += int(rand.expovariate(1.0 / (options.offline_length * 60)))
+  if not crash:
+    add(end, 'Stopping the server')
+    add(end, 'Stopping server')
+    add(end, 'Saving players')
+    add(end, 'Saving worlds')
+  events.sort()
+  return [line for time, order, line in events if time <= end]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def generate_logs(directory, options=None):
+  """
+  generate_logs writes synthetic logfiles into directory, named like the ones of the server (YYYY-MM-DD-N.log.gz). Each server run is one logfile, runs may go on past midnight and some of them end in a crash.
+  directory - the directory to write the logfiles to, it is created if needed
+  options - a LogOptions, the defaults are used if not given
+  Returns the list of written logfiles, in chronological order.
+  """
+  if options is None:
+    options = LogOptions()
+  rand = random.Random(options.seed)
+  players = ['player%d' % number for number in range(options.players)]
+  deathlist = read_deathlist()
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  filenames = []
+  # time is counted in seconds from midnight of the first day
+  time = 6 * 3600
+  end_of_logs = options.days * 86400
+  runs = {}
+  while time < end_of_logs:
+    length = max(600, int(rand.expovariate(1.0 / (options.run_length * 3600))))
+    end = min(time + length, end_of_logs)
+    crash = rand.random() < options.crash_rate
+    day = time // 86400
+    lines = generate_run(time - day * 86400, end - day * 86400, crash, options, rand, players, deathlist)
+    # the logfile is named after the day the run started
+    runs[day] = runs.get(day, 0) + 1
+    date = options.start_date + datetime.timedelta(days=day)
+    filename = os.path.join(directory, '%s-%d.log' % (date.isoformat(), runs[day]))
+    if options.compress:
+      filename += '.gz'
+      logfile = gzip.open(filename, 'wb')
+    else:
+      logfile = open(filename, 'w')
+    logfile.write('\n'.join(lines) + '\n')
+    logfile.close()
+    filenames.append(filename)
+    # time until the server is up again
+    time = end + rand.randint(10, 600)
+  return filenames
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def print_help():
+  """
+  print_help will display usage instructions for mcLogGen. It will stop the program after printing.
+  """
+  print 'Minecraft Log Generator - Usage'
+  print FontStyle.bold + 'mcLogGen' + FontStyle.normal, '[--help] [--days N] [--players N] [--session minutes] [--chat rate] [--deaths rate] [--crashes probability] [--plain] [--seed N]', FontStyle.bold + 'directory' + FontStyle.normal
+  print FontStyle.bold + '\t--days N' + FontStyle.normal
+  print '\t\tNumber of days to create logs for, default', LogOptions.days
+  print FontStyle.bold + '\t--players N' + FontStyle.normal
+  print '\t\tNumber of different players, default', LogOptions.players
+  print FontStyle.bold + '\t--session minutes' + FontStyle.normal
+  print '\t\tMean time a player is online, default', LogOptions.session_length
+  print FontStyle.bold + '\t--chat rate' + FontStyle.normal
+  print '\t\tChat messages of an online player per minute, default', LogOptions.chat_rate
+  print FontStyle.bold + '\t--deaths rate' + FontStyle.normal
+  print '\t\tDeaths of an online player per minute, default', LogOptions.death_rate
+  print FontStyle.bold + '\t--crashes probability' + FontStyle.normal
+  print '\t\tProbability that a server run ends without "Stopping the server", default', LogOptions.crash_rate
+  print FontStyle.bold + '\t--plain' + FontStyle.normal
+  print '\t\tWrite plaintext .log files instead of .log.gz files.'
+  print FontStyle.bold + '\t--seed N' + FontStyle.normal
+  print '\t\tSeed for the random numbers, the same seed gives the same logs.'
+  exit(0)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def parse_options(args):
+  """
+  parse_options removes the options for the synthetic logs from args and gives them as LogOptions.
+  args - a list of command line arguments
+  """
+  options = LogOptions()
+  for flag, name, convert in (('--days', 'days', int),
+                              ('--players', 'players', int),
+                              ('--session', 'session_length', float),
+                              ('--chat', 'chat_rate', float),
+                              ('--deaths', 'death_rate', float),
+                              ('--crashes', 'crash_rate', float),
+                              ('--seed', 'seed', int)):
+    if flag in args:
+      index = args.index(flag)
+      setattr(options, name, convert(args[index + 1]))
+      del args[index+1] # value
+      del args[index] # flag
+  if '--plain' in args:
+    options.compress = False
+    del args[args.index('--plain')]
+  return options
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def main():
+  args = sys.argv[1:]
+  if not args or '-h' in args or '--help' in args:
+    print_help()
+  options = parse_options(args)
+  if len(args) != 1:
+    print FontStyle.red + 'give exactly one directory\n' + FontStyle.normal
+    print_help()
+  filenames = generate_logs(args[0], options)
+  print 'wrote', len(filenames), 'logfiles to', args[0]
+
+
+# standard boilerplate
+if __name__ == '__main__':
+  main()
@@ -24,10 +24,36 @@
 # import modules used here
 import sys
 import os
-import gzip
+import hashlib
+import glob
+import heapq
+import io
+import contextlib
+import functools
+try:
+  import resource
+except ImportError: # not on windows, the memory is not measured then
+  resource = None
+import json
+import math
+import mmap
+import array
+import bisect
+import itertools
+import multiprocessing
 import re
 #import copy
 import datetime
+import time
+import sqlite3
+import threading
+import tempfile
+import shutil
+import zlib
+import BaseHTTPServer
+import cPickle
+import cProfile
+import pystache
 from pystache import Renderer
 
 # global variables (ugh)
@@ -35,13 +61,25 @@ global verbose
 verbose = False
 
 _NAME = "mcStats"
+# the ordinal of 1970-01-01, times are kept as seconds since then
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
 layout_template = "templates/layout.mustache"
+section_template = "templates/section.mustache"
+chart_template = "templates/chart.mustache"
 
 def set_verbose(boolean=True):
   global verbose
   verbose = boolean
   return
 
+# the file with the patterns of the events, None for the one next to mcStats (see read_patterns)
+patterns_file = None
+
+def set_patterns_file(filename):
+  global patterns_file
+  patterns_file = filename
+  return
+
 
 class Regex:
   """
@@ -50,42 +88,43 @@ class Regex:
   def __init__(self):
     pass
 
-  # this regex finds chat messages
-  # ex: [17:42:42] [Server thread/INFO]: <herobrine> I really like this game.
-  chat = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: \* (\S+)')
-  # this regex finds connections losses
-  # ex: [10:42:23] [Server thread/INFO]: herobrine lost connection: TextComponent...
-  con_lost = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: (\S+) lost connection:')
-  # this regex finds emotes
-  # ex: [17:42:23] [Server thread/INFO]: * herobrine nice game
-  emote = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: <(\S+)>')
   # this regex is used to extract the date from the filename
   # ex: 2014-28-03
   file_date = re.compile(r'(\d{4}-\d{2}-\d{2})')
-  # this regex finds kick events
-  # ex: [10:42:23] [Server thread/INFO]: Kicked herobrine from the game: 'herobrine is not wanted'
-  kick = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: Kicked (\S+) from the game')
-  # this regex finds a login
-  # ex: [10:42:23] [Server thread/INFO]: herobrine joined the game
-  login = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: (\S+) joined the game')
-  # this regex finds a logout
-  # ex: [10:42:23] [Server thread/INFO]: herobrine left the game
-  logout = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: (\S+) left the game')
-  # this regex finds the user name of a line where a user does something
-  # ex: [23:42:00] [Server thread/INFO]: herobrine drowned
-  name = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: (\S+)')
-  # this regex finds the start of the server
-  # ex: [17:28:14] [Server thread/INFO]: Starting minecraft server version 1.7.2
-  # ex: [17:28:15] [Server thread/INFO]: Starting Minecraft server on 192.169.0.1:25566
-  # ex: [15:35:24] [Server thread/INFO]: Starting minecraft server version 14w11a
-  start = re.compile(r'\[\d{2}:\d{2}:\d{2}\] \[[\w\s]+/[A-Z]+\]: Starting [Mm]inecraft server (on \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d{1,5}|version (\d+\.\d+\.\d+|\d{2}w\d{2}[a-z]*))')
-  # this regex finds a server stop
-  # ex: [10:42:23] [Server thread/INFO]: Stopping the server
-  # ex: [10:42:23] [Server thread/INFO]: Stopping server
-  stop = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] \[Server thread/INFO\]: Stopping( the)* server')
-  # this regex is supposed to find the date
-  # ex: [10:42:23] [<thread>/<INFO|WARN|...>]: <message>
-  time = re.compile(r'^\[(\d{2}:\d{2}:\d{2})\]')
+  # this regex is used to extract the rotation index from the filename, the server starts a new logfile each time it is started
+  # ex: 2014-03-28-2.log.gz
+  file_index = re.compile(r'\d{4}-\d{2}-\d{2}-(\d+)')
+  # the header of the lines of the vanilla server, used if the patterns file has none (see read_patterns)
+  # the groups hour, minute and second give the time of each line, the empty group message marks where the message starts,
+  # it is only part of the match for the lines of the server thread, all events are written by it
+  # ex: [10:42:23] [Server thread/INFO]: <message>
+  header = r'\[(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2})\] (?:\[Server thread/INFO\]: (?P<message>))?'
+  # this regex finds the names of the groups in a pattern of an event
+  # ex: (?P<player>\S+) joined the game -> player
+  pattern_group = re.compile(r'\(\?P<(\w+)>')
+  # this regex finds the words of a chat message, which are searched with --search
+  # ex: anyone got iron? -> anyone, got, iron
+  word = re.compile(r'\w+')
+
+
+class Event:
+  """
+  The Event class includes the types of events tokenize_line can find in the logs.
+  """
+  def __init__(self):
+    pass
+
+  login = 0
+  logout = 1
+  kick = 2
+  con_lost = 3
+  chat = 4
+  emote = 5
+  death = 6
+  start = 7
+  stop = 8
+  # the names of the events, indexed by their value
+  names = ('login', 'logout', 'kick', 'con_lost', 'chat', 'emote', 'death', 'start', 'stop')
 
 
 
@@ -110,6 +149,99 @@ class FontStyle:
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+class Timing:
+  """
+  The Timing class adds up the time spent in the stages of mcStats. It is shared by all threads.
+  seconds - the time spent in parts of reading the logfiles, i.e. decompressing {part: seconds}
+  stages - the calls of the instrumented functions (see instrument) {stage: {'calls', 'wall', 'cpu', 'peak_memory_added_kb', counter: value}}, times in seconds
+  The peak memory can only be measured for the whole process, so each stage gets the amount by which its calls raised it. The peak of the whole process is given once, by to_json.
+  Without the resource module (i.e. on windows) the memory fields are left out.
+  """
+  def __init__(self):
+    self.seconds = {}
+    self.stages = {}
+    self.lock = threading.Lock()
+
+  def add(self, stage, seconds):
+    """
+    add adds seconds to the time spent in stage.
+    """
+    with self.lock:
+      self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+    return
+
+  def get(self, stage):
+    """
+    get gives the time spent in stage so far.
+    """
+    return self.seconds.get(stage, 0.0)
+
+  def stage(self, stage):
+    """
+    stage gives the record of stage, a new one if stage has not been seen before. The lock has to be held.
+    """
+    if stage not in self.stages:
+      self.stages[stage] = {'calls': 0, 'wall': 0.0, 'cpu': 0.0}
+      if resource:
+        self.stages[stage]['peak_memory_added_kb'] = 0
+    return self.stages[stage]
+
+  def count(self, stage, counter, number=1):
+    """
+    count adds number to counter (i.e. 'lines' or 'bytes') of stage.
+    """
+    with self.lock:
+      record = self.stage(stage)
+      record[counter] = record.get(counter, 0) + number
+    return
+
+  @contextlib.contextmanager
+  def measure(self, stage):
+    """
+    measure records the wall time, cpu time and the increase of the peak memory of the code run in a with statement as stage.
+    """
+    wall = time.time()
+    cpu = time.clock()
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    try:
+      yield
+    finally:
+      with self.lock:
+        record = self.stage(stage)
+        record['calls'] += 1
+        record['wall'] += time.time() - wall
+        record['cpu'] += time.clock() - cpu
+        if resource:
+          # the peak memory of the whole process only grows, by the memory the stage needed beyond the peak before
+          record['peak_memory_added_kb'] += resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory
+
+  def to_json(self):
+    """
+    to_json gives all records as json.
+    """
+    with self.lock:
+      records = {'stages': self.stages, 'seconds': self.seconds}
+      if resource:
+        records['peak_memory_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      return json.dumps(records, indent=2, sort_keys=True)
+
+timing = Timing()
+
+
+def instrument(function):
+  """
+  instrument records each call of function as a stage of timing, named after the function.
+  """
+  @functools.wraps(function)
+  def instrumented(*args, **kwargs):
+    with timing.measure(function.__name__):
+      return function(*args, **kwargs)
+  return instrumented
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
 def read_logfiles(filenames):
   """
   Give a list of valid minecraft logfiles in either gzipped (.gz) or plaintext (.log) format, read_logfiles extract the text from all logfiles as a list.
@@ -141,7 +273,7 @@ def read_single_file(filename):
     # .gz files are zipped, open accordingly
     if verbose:
       print 'open gzipped file', filename
-    f = gzip.open(filename, 'rb')
+    f = open(filename, 'rb')
   else:
     # .log are plaintext files, just open
     if verbose:
@@ -155,7 +287,11 @@ def read_single_file(filename):
       print 'processing', filename
     # include filename into text, s.t. date can be extracted if needed
     text = 'date: ' + file_name + '\n'
-    text += f.read()
+    if file_extension == '.gz':
+      text += ''.join(gzip_chunks(filename))
+    else:
+      text += f.read()
+      timing.count('read', 'bytes', len(text))
   else:
     # file is not in a known format, don't use
     if verbose:
@@ -166,280 +302,2446 @@ def read_single_file(filename):
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
-def purge_chat(raw_data):
+def stream_logfiles(filenames, prefetch=0):
+  """
+  Given a list of valid minecraft logfiles in either gzipped (.gz) or plaintext (.log) format, stream_logfiles yields a tuple (filename, file_date, lines) for each logfile. lines is a generator over the lines of this logfile. Only one logfile is open at a time and its lines are read when they are needed, so the memory used does not depend on the size or number of the logfiles. The lines of one logfile have to be consumed before the next tuple is requested.
+  filenames - a list of logfiles to process
+  prefetch - the number of upcoming .gz logfiles which are decompressed in background threads while the current one is read, these are kept in memory
+  """
+  logfiles = []
+  for filename in filenames:
+    if not os.path.exists(os.path.abspath(filename)):
+      if verbose:
+        print filename, 'is not a file'
+      continue
+    if not filename.endswith('.gz') and not filename.endswith('.log'):
+      # file is not in a known format, don't use
+      if verbose:
+        print filename, 'is not a logfile'
+      continue
+    logfiles.append(filename)
+  prefetcher = None
+  if prefetch > 0:
+    prefetcher = GzipPrefetcher([filename for filename in logfiles if filename.endswith('.gz')], prefetch)
+  for filename in logfiles:
+    if prefetcher and filename.endswith('.gz'):
+      if verbose:
+        print 'using prefetched file', filename
+      yield filename, logfile_date(filename), split_lines(prefetcher.chunks(filename))
+    else:
+      yield filename, logfile_date(filename), stream_single_file(filename)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def stream_single_file(filename):
+  """
+  Given either a .gz or .log file, stream_single_file will yield the lines of the file one at a time, without the trailing newline.
+  filename - a single logfile
+  """
+  if filename.endswith('.gz'):
+    # .gz files are zipped, they are decompressed in large chunks
+    if verbose:
+      print 'open gzipped file', filename
+    for line in split_lines(gzip_chunks(filename)):
+      yield line
+    return
+  # .log are plaintext files, they are read in large chunks as well
+  if verbose:
+    print 'open file', filename
+  for line in split_lines(file_chunks(filename)):
+    yield line
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def gzip_chunks(filename, stage='decompress', chunk_size=1 << 20):
+  """
+  gzip_chunks yields the decompressed content of a .gz file in large chunks. The compressed data is read into a single buffer, which is reused for the whole file, and decompressed with zlib directly instead of the (much slower) gzip module. Files of several gzip members are read completely, like gzip does.
+  filename - a single .gz file
+  stage - the stage of timing the time spent in zlib is added to
+  chunk_size - the number of bytes read at once
+  """
+  compressed = bytearray(chunk_size)
+  # 16 + MAX_WBITS makes zlib expect a gzip header and trailer
+  decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+  f = open(filename, 'rb')
+  try:
+    size = f.readinto(compressed)
+    while size:
+      start = time.time()
+      data = decompressor.decompress(buffer(compressed, 0, size))
+      while decompressor.unused_data:
+        # the member has ended, the next one starts with a new header
+        rest = decompressor.unused_data
+        if not rest.strip('\0'):
+          # only padding after the last member
+          break
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data += decompressor.decompress(rest)
+      timing.add(stage, time.time() - start)
+      timing.count('read', 'compressed bytes', size)
+      timing.count('read', 'bytes', len(data))
+      if data:
+        yield data
+      size = f.readinto(compressed)
+    data = decompressor.flush()
+    if data:
+      yield data
+  finally:
+    f.close()
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def file_chunks(filename, chunk_size=1 << 20):
+  """
+  file_chunks yields the content of a plaintext file in large chunks, read with plain buffered reads. split_lines splits each chunk with a single str.split, which is faster than the line iterator of the file object.
+  filename - a single plaintext file
+  chunk_size - the number of bytes read at once
+  """
+  f = open(filename, 'rb')
+  try:
+    data = f.read(chunk_size)
+    while data:
+      timing.count('read', 'bytes', len(data))
+      yield data
+      data = f.read(chunk_size)
+  finally:
+    f.close()
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def split_lines(chunks):
+  """
+  split_lines yields the lines of the text given as chunks (i.e. by gzip_chunks or file_chunks), without the trailing newline or carriage return. Lines may span several chunks.
+  """
+  rest = ''
+  for chunk in chunks:
+    lines = (rest + chunk).split('\n')
+    # the last line is not complete yet
+    rest = lines.pop()
+    timing.count('read', 'lines', len(lines))
+    for line in lines:
+      # logfiles written on windows end their lines with '\r\n'
+      yield line.rstrip('\r')
+  if rest:
+    timing.count('read', 'lines')
+    yield rest.rstrip('\r')
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class GzipPrefetcher:
+  """
+  The GzipPrefetcher class decompresses upcoming .gz logfiles in background threads, while the current logfile is parsed by the main thread. zlib releases the GIL while it decompresses, so this runs in parallel to the parsing. The files are decompressed in the order they are given, at most ahead files at a time.
+  """
+  def __init__(self, filenames, ahead):
+    self.pending = list(filenames)
+    self.ahead = ahead
+    # the files being decompressed, in order [(filename, thread, result)], result is a list which receives the chunks or an exception
+    self.running = []
+    self.start()
+
+  def start(self):
+    """
+    start starts threads for the next pending files, until ahead files are being decompressed.
+    """
+    while self.pending and len(self.running) < self.ahead:
+      filename = self.pending.pop(0)
+      result = []
+      thread = threading.Thread(target=self.decompress, args=(filename, result))
+      # an interrupted program does not wait for the threads
+      thread.daemon = True
+      thread.start()
+      self.running.append((filename, thread, result))
+    return
+
+  def decompress(self, filename, result):
+    """
+    decompress runs in a background thread and puts the chunks of filename into result.
+    """
+    try:
+      result.append(list(gzip_chunks(filename, 'decompress (background)')))
+    except (IOError, zlib.error), error:
+      result.append(error)
+    return
+
+  def chunks(self, filename):
+    """
+    chunks gives the decompressed chunks of filename, which has to be the next file given to the GzipPrefetcher. It waits for the thread if needed.
+    """
+    running_filename, thread, result = self.running.pop(0)
+    assert running_filename == filename
+    start = time.time()
+    thread.join()
+    timing.add('wait for decompression', time.time() - start)
+    # the next file can be decompressed now
+    self.start()
+    if not isinstance(result[0], list):
+      raise result[0]
+    return result[0]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def logfile_date(filename):
+  """
+  logfile_date extracts the date from the name of a logfile, e.g. 2014-03-28 for 2014-03-28-1.log.gz. If the name contains no date (e.g. latest.log), None is returned.
+  filename - a single logfile
+  """
+  file_date = re.search(Regex.file_date, os.path.basename(filename))
+  if file_date:
+    return file_date.group()
+  return None
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def logfile_order(filename):
+  """
+  logfile_order gives the key to sort logfiles chronologically: by the date in the name, then by the rotation index (2014-03-28-2.log.gz comes after 2014-03-28-1.log.gz). Logfiles without a date (i.e. latest.log) come last.
+  filename - a single logfile
+  """
+  basename = os.path.basename(filename)
+  file_date = logfile_date(filename)
+  if file_date is None:
+    return (1, '', 0, basename)
+  file_index = re.search(Regex.file_index, basename)
+  if file_index:
+    return (0, file_date, int(file_index.group(1)), basename)
+  return (0, file_date, 0, basename)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def find_logfiles(paths):
+  """
+  find_logfiles expands the paths given on the command line to a list of logfiles. A directory gives all .log and .log.gz files in it, a pattern (i.e. 'logs/2014-03-*', quoted s.t. the shell does not expand it) gives all matching logfiles. Both are sorted chronologically by logfile_order, so users online across logfiles are followed correctly. Other paths are kept in the given order.
+  paths - a list of logfiles, directories and patterns
+  """
+  filenames = []
+  for path in paths:
+    if os.path.isdir(path):
+      # the names tell which files are logfiles and their order, so no file has to be looked at
+      found = [os.path.join(path, name) for name in os.listdir(path)
+               if name.endswith('.log') or name.endswith('.log.gz')]
+    elif glob.has_magic(path) and not os.path.exists(path):
+      found = [name for name in glob.glob(path)
+               if (name.endswith('.log') or name.endswith('.log.gz')) and os.path.isfile(name)]
+    elif os.path.exists(path):
+      filenames.append(path)
+      continue
+    else:
+      sys.stderr.write(FontStyle.bold +
+                       'find_logfiles:\n\t'
+                       + FontStyle.normal +
+                       path + ' does not exist\n')
+      continue
+    if not found:
+      sys.stderr.write(FontStyle.bold +
+                       'find_logfiles:\n\t'
+                       + FontStyle.normal +
+                       'no logfiles found in ' + path + '\n')
+    if verbose:
+      print len(found), 'logfiles found in', path
+    filenames.extend(sorted(found, key=logfile_order))
+  return filenames
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def purge_chat(raw_data):
+  """
+  purge_chat will split the logfiles into one file containing everything but chat/emotes and one file containing only chat/emotes.
+  raw_data - a list of logfiles, each logfile is a string containing the whole file
+  """
+  chatless = []
+  chatfull = []
+  # only the header and the patterns of chat messages and emotes are needed
+  matcher = EventMatcher([(event, pattern) for event, pattern in read_patterns() if event in (None, Event.chat, Event.emote)], [])
+  for logfile in raw_data:
+    chatlines = []
+    loglines = []
+    # logfile is the content of a single log file
+    lines = logfile.split('\n')
+    for line in lines:
+      # the line is either a chat/emote line, or not, put it into the according structure
+      if tokenize_line(line, matcher):
+        chatlines.append(line)
+      else:
+        loglines.append(line)
+    loglines = '\n'.join(loglines)
+    chatlines = '\n'.join(chatlines)
+    chatless.append(loglines)
+    chatfull.append(chatlines)
+  return chatless, chatfull
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def read_deathlist():
+  """
+  read_deathlist reads the list of possible death messages from the deathlist file, which is located next to mcStats.
+  """
+  deathlist_file = open(os.path.join(sys.path[0], 'deathlist'), 'r')
+  deathlist = deathlist_file.read().split('\n')
+  deathlist_file.close()
+  # the file may contain empty lines, these would match every single line
+  return [deathline for deathline in deathlist if deathline]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def read_patterns(filename=None):
+  """
+  read_patterns reads the patterns of the events from the patterns file, which is located next to mcStats. Each line of the file is the name of an event (see Event) and a regex, which is matched at the start of the message. Lines starting with '#' are comments.
+  The line 'header <regex>' gives the header of the lines instead of the one of the vanilla server (see Regex.header), with the time of each line as the groups hour, minute and second. If it has a group message, the message starts there and lines where it is not part of the match contain no events.
+  Patterns with an unknown event, an invalid regex or without the groups their event needs are left out with a warning.
+  filename - the file to read instead, by default the one set with --patterns
+  Returns a list of (event, regex) in the order of the file, the header comes first as (None, regex).
+  """
+  if filename is None:
+    filename = patterns_file or os.path.join(sys.path[0], 'patterns')
+  config_file = open(filename, 'r')
+  lines = config_file.read().split('\n')
+  config_file.close()
+  header = Regex.header
+  patterns = []
+  for line in lines:
+    if not line.strip() or line.startswith('#'):
+      continue
+    fields = line.split(None, 1)
+    problem = None
+    groups = {}
+    if fields[0] not in Event.names and fields[0] != 'header':
+      problem = 'unknown event'
+    elif len(fields) < 2:
+      problem = 'no regex'
+    else:
+      try:
+        groups = re.compile(fields[1]).groupindex
+      except re.error, error:
+        problem = 'invalid regex (%s)' % error
+    if problem is None and fields[0] == 'header':
+      for group in ('hour', 'minute', 'second'):
+        if group not in groups:
+          problem = 'no group ' + group
+    elif problem is None:
+      event = Event.names.index(fields[0])
+      if event not in (Event.start, Event.stop) and 'player' not in groups:
+        problem = 'no group player'
+      elif event == Event.death and 'cause' not in groups:
+        problem = 'no group cause'
+    if problem:
+      sys.stderr.write(FontStyle.bold +
+                       'read_patterns:\n\t'
+                       + FontStyle.normal +
+                       problem + ', pattern is left out:\n\t'
+                       + line + '\n')
+      continue
+    if fields[0] == 'header':
+      header = fields[1]
+    else:
+      patterns.append((event, fields[1]))
+  return [(None, header)] + patterns
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class EventMatcher:
+  """
+  The EventMatcher class combines the patterns of all events (see read_patterns) and all death messages from the deathlist into a single regex, which is anchored at the start of the message. Each line has to be matched only once to find its event, however many patterns there are.
+  The patterns are tried in their order, the death messages last and longer ones first, s.t. 'drowned whilst trying to escape' is not found as 'drowned'. Consecutive patterns starting with the name of the user share it, s.t. it is matched only once for all of them.
+  Names of other users or mobs are left out in the deathlist, e.g. 'was slain by  using' or 'was doomed to fall (by )', these gaps match any text.
+  The header of the lines is the one of the patterns or the one of the vanilla server. The vanilla header is not matched as a regex, it is checked at its fixed positions (see tokenize_line and line_seconds).
+  """
+  # patterns starting with this share the name of the user with the ones next to them
+  player_prefix = r'(?P<player>\S+) '
+  # the part of the vanilla header after the time and the position of the message after it
+  # ex: [10:42:23] [Server thread/INFO]: <message>
+  vanilla_header = ' [Server thread/INFO]: '
+  vanilla_message = 33
+
+  def __init__(self, patterns, deathlist):
+    # each alternative is (event, pattern without the names of its groups, {name: group within the alternative}, cause),
+    # the group of the player is 0 for those sharing the name of the user, cause is for the death messages only
+    alternatives = []
+    header = Regex.header
+    for event, pattern in patterns:
+      if event is None:
+        header = pattern
+        continue
+      groups = re.compile(pattern).groupindex
+      if pattern.startswith(self.player_prefix) and groups.get('player') == 1:
+        pattern = pattern[len(self.player_prefix):]
+        groups = dict((name, group - 1) for name, group in groups.iteritems())
+      alternatives.append((event, Regex.pattern_group.sub('(', pattern), groups, None))
+    for deathline in sorted(set(deathlist), key=len, reverse=True):
+      alternative = re.escape(deathline)
+      alternative = alternative.replace(re.escape('  '), re.escape(' ') + '.*' + re.escape(' '))
+      alternative = alternative.replace(re.escape(' )'), re.escape(' ') + '.*' + re.escape(')'))
+      alternatives.append((Event.death, alternative, {'player': 0}, deathline.strip()))
+    # for the group around each alternative: (event, group of the player, cause, groups of the cause, group of the message),
+    # the group of the player is None if the event has no user, the groups of the cause are (cause, target) for deaths with a group cause,
+    # the group of the message is the chat message of chat and emotes, 0 if the pattern has none (the rest of the line is the message)
+    self.alternatives = {}
+    regex = []
+    group = 1
+    shared_group = None
+    for event, pattern, groups, cause in alternatives:
+      if groups.get('player') == 0:
+        if shared_group is None:
+          # the first one of consecutive alternatives sharing the name of the user
+          shared_group = group
+          regex.append(r'|(\S+) (?:')
+          group += 1
+        else:
+          regex.append('|')
+        groups = dict(groups, player=shared_group - group)
+      else:
+        if shared_group is not None:
+          regex.append(')')
+          shared_group = None
+        regex.append('|')
+      regex.append('(' + pattern + ')')
+      cause_groups = None
+      if 'cause' in groups:
+        cause_groups = group + groups['cause'], group + groups['target'] if 'target' in groups else None
+      message = None
+      if event == Event.chat or event == Event.emote:
+        message = group + groups['message'] if 'message' in groups else 0
+      self.alternatives[group] = (event, group + groups['player'] if 'player' in groups else None, cause, cause_groups, message)
+      group += 1 + re.compile(pattern).groups
+    if shared_group is not None:
+      regex.append(')')
+    if alternatives:
+      # the first alternative does not need a '|'
+      self.regex = re.compile(''.join(regex)[1:])
+    else:
+      # without any patterns, nothing is found
+      self.regex = re.compile(r'(?!)')
+    # the header as a regex, None for the vanilla header
+    self.header = None
+    if header != Regex.header:
+      self.header = re.compile(header)
+      self.time_groups = tuple(self.header.groupindex[name] for name in ('hour', 'minute', 'second'))
+      self.message_group = self.header.groupindex.get('message')
+      # the last line the header was matched for and its match, the header of each line is matched only once (see header_match)
+      self.header_line = None
+      self.header_result = None
+    else:
+      # the time of the vanilla header is always at the same position, it is decoded by the function directly
+      self.line_seconds = line_seconds
+
+  def header_match(self, line):
+    """
+    header_match matches the header at the start of line, unless it was the line before.
+    line - a single line from a logfile
+    Returns the match or None.
+    """
+    if line is not self.header_line:
+      self.header_line = line
+      self.header_result = self.header.match(line)
+    return self.header_result
+
+  def message_start(self, line):
+    """
+    message_start gives the position of the message in line, the events are matched there. It is -1 if line has no message, i.e. it is not written by the server thread. The vanilla header is checked by tokenize_line instead.
+    line - a single line from a logfile
+    """
+    header = self.header_match(line)
+    if header is None:
+      return -1
+    if self.message_group is None:
+      return header.end()
+    return header.end(self.message_group)
+
+  def line_seconds(self, line):
+    """
+    line_seconds gives the time of a line as seconds since midnight from the groups hour, minute and second of the header (see line_seconds for the vanilla header). If the line does not start with the header, None is returned.
+    line - a single line from a logfile
+    """
+    header = self.header_match(line)
+    if header is None:
+      return None
+    hour, minute, second = header.group(*self.time_groups)
+    return int(hour) * 3600 + int(minute) * 60 + int(second)
+
+  def match(self, line, pos):
+    """
+    match looks for an event in the message of line.
+    line - a single line from a logfile, the header has to be checked already (see tokenize_line)
+    pos - the position of the message in line
+    Returns a tuple (event, user, cause, message) like tokenize_line or None, if the line contains no known event.
+    """
+    search_result = self.regex.match(line, pos)
+    if search_result is None:
+      return None
+    # the group around the alternative which matched is the last one
+    event, player, cause, cause_groups, message = self.alternatives[search_result.lastindex]
+    if cause_groups:
+      cause_group, target = cause_groups
+      cause = search_result.group(cause_group)
+      if target and search_result.group(target) is not None:
+        # the target is left out of the cause, like in the deathlist
+        offset = search_result.start(cause_group)
+        cause = cause[:max(search_result.start(target) - offset, 0)] + cause[max(search_result.end(target) - offset, 0):]
+      cause = cause.strip()
+    if message is not None:
+      if message:
+        message = search_result.group(message)
+      else:
+        message = line[search_result.end():].strip()
+    return event, player and search_result.group(player), cause, message
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def tokenize_line(line, matcher):
+  """
+  Given a single line of a minecraft logfile, tokenize_line will classify the line as one of the events from the Event class. This is done only once for each line, the result is used for all statistics.
+  The header of the line is checked once, then the message is matched once against the patterns of all events.
+  line - a single line from a logfile
+  matcher - an EventMatcher with the header and the patterns of the events to find
+  Returns a tuple (event, user, cause, message), user is None for server events, cause is None for everything but deaths and message is None for everything but chat and emotes. If the line contains no known event, None is returned.
+  """
+  if matcher.header is None:
+    # the vanilla header is checked inline, this is done for every line
+    start = EventMatcher.vanilla_message
+    if line[10:start] == EventMatcher.vanilla_header and line[0] == '[' and line[9] == ']':
+      return matcher.match(line, start)
+  else:
+    start = matcher.message_start(line)
+    if start >= 0:
+      return matcher.match(line, start)
+  # not written by the server thread, this can only be a server start
+  if 'Starting ' in line:
+    message = line.find(']: ', 10)
+    token = message >= 0 and matcher.match(line, message + 3)
+    if token and token[0] == Event.start:
+      return token
+  return None
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def line_seconds(line):
+  """
+  line_seconds gives the time of a line with the vanilla header as seconds since midnight. The time is always at the same position at the start of the line, so it is decoded directly from its digits. If the line does not start with a time, None is returned.
+  line - a single line from a logfile
+  """
+  if line[0:1] == '[' and line[9:10] == ']' and line[3] == ':' and line[6] == ':':
+    # [HH:MM:SS], the digits are decoded from their character codes, 1933008 is the sum of all '0' * their weights
+    return (ord(line[1]) * 36000 + ord(line[2]) * 3600 + ord(line[4]) * 600 + ord(line[5]) * 60
+            + ord(line[7]) * 10 + ord(line[8]) - 1933008)
+  return None
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def date_seconds(file_date):
+  """
+  date_seconds gives the midnight of file_date as seconds since 1970-01-01. All times are kept as these integer seconds, in the local time of the server.
+  file_date - a date as 'YYYY-MM-DD'
+  """
+  year, month, day = file_date.split('-')
+  return (datetime.date(int(year), int(month), int(day)).toordinal() - _EPOCH) * 86400
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class UserTable:
+  """
+  The UserTable class interns the names of users: each name is kept only once and gets a dense id, which is its index in names. The statistics are kept in arrays indexed by these ids instead of dictionaries keyed by the names.
+  """
+  def __init__(self, names=()):
+    self.names = []
+    self.ids = {}
+    for name in names:
+      self.intern(name)
+
+  def intern(self, name):
+    """
+    intern gives the id of name, names seen for the first time get the next free id.
+    """
+    user_id = self.ids.get(name)
+    if user_id is None:
+      user_id = len(self.names)
+      self.ids[name] = user_id
+      self.names.append(name)
+    return user_id
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class Intervals:
+  """
+  The Intervals class keeps the sessions of the users and the runs of the server as intervals from start to end, instead of only adding up their length. All times are seconds since 1970-01-01, users are given by their ids (see UserTable). The intervals are used to find the number of users online at the same time (see concurrency) and the uptime of the server.
+  """
+  def __init__(self):
+    self.session_users = array.array('i')
+    self.session_starts = array.array('l')
+    self.session_ends = array.array('l')
+    self.run_starts = array.array('l')
+    self.run_ends = array.array('l')
+
+  def add_session(self, user, start, end):
+    """
+    add_session adds a session of user from start to end.
+    """
+    self.session_users.append(user)
+    self.session_starts.append(start)
+    self.session_ends.append(end)
+    return
+
+  def add_run(self, start, end):
+    """
+    add_run adds a run of the server from its start to its stop (or crash).
+    """
+    self.run_starts.append(start)
+    self.run_ends.append(end)
+    return
+
+  def extend(self, other, ids):
+    """
+    extend adds all intervals of other, i.e. of a single logfile or of another server.
+    ids - the ids used here for the ids of the users of other
+    """
+    self.session_users.extend(array.array('i', [ids[user] for user in other.session_users]))
+    self.session_starts.extend(other.session_starts)
+    self.session_ends.extend(other.session_ends)
+    self.run_starts.extend(other.run_starts)
+    self.run_ends.extend(other.run_ends)
+    return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class DailyRollup:
+  """
+  The DailyRollup class keeps the activity of each user on each day: the online seconds, logins, deaths and chat messages, and the first and last time the user was seen. Users are given by their ids (see UserTable), days by their number since 1970-01-01. Only the days a user was active are kept, so the rollup of years of logfiles stays small and charts can be drawn from it instead of the logfiles (see daily_series).
+  """
+  # the values kept for each user and day, in this order
+  columns = ('online_seconds', 'logins', 'deaths', 'chats')
+  # the column counted for each event, see add_event
+  event_columns = {Event.login: 1, Event.death: 2, Event.chat: 3, Event.emote: 3}
+
+  def __init__(self):
+    # the values of each user and day {(user, day): array of columns}
+    self.days = {}
+    # the first and last time each user was seen {user: seconds since 1970-01-01}
+    self.first_seen = {}
+    self.last_seen = {}
+
+  def row(self, user, day):
+    """
+    row gives the values of user on day, which are created if needed.
+    """
+    values = self.days.get((user, day))
+    if values is None:
+      values = self.days[(user, day)] = array.array('l', [0] * len(self.columns))
+    return values
+
+  def add_event(self, user, time, event):
+    """
+    add_event counts an event of user at time.
+    """
+    if user not in self.first_seen:
+      self.first_seen[user] = time
+    self.last_seen[user] = time
+    column = self.event_columns.get(event)
+    if column is not None:
+      self.row(user, time // 86400)[column] += 1
+    return
+
+  def add_session(self, user, start, end):
+    """
+    add_session adds a session of user from start to end to the online seconds of each day it covers.
+    """
+    while start < end:
+      day = start // 86400
+      until = min(end, (day + 1) * 86400)
+      self.row(user, day)[0] += until - start
+      start = until
+    if end > self.last_seen.get(user, end):
+      self.last_seen[user] = end
+    return
+
+  def extend(self, other, ids):
+    """
+    extend adds the rollup of other, i.e. of a single logfile or of another server.
+    ids - the ids used here for the ids of the users of other
+    """
+    for (user, day), values in other.days.iteritems():
+      row = self.row(ids[user], day)
+      for column, value in enumerate(values):
+        row[column] += value
+    for user, time in other.first_seen.iteritems():
+      user = ids[user]
+      if user not in self.first_seen or time < self.first_seen[user]:
+        self.first_seen[user] = time
+    for user, time in other.last_seen.iteritems():
+      user = ids[user]
+      if time > self.last_seen.get(user, time - 1):
+        self.last_seen[user] = time
+    return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class HyperLogLog:
+  """
+  The HyperLogLog class estimates the number of different names added to it in constant memory: each name is hashed, the first bits of the hash choose one of 2**precision registers, which keeps the longest run of leading zeros of the other bits seen so far. The error of the estimate is about 1.04 / sqrt(2**precision), 1.6% by default. Sketches are merged by taking the maximum of each register, so the order of adding and merging does not change the result.
+  """
+  def __init__(self, precision=12):
+    self.precision = precision
+    self.registers = bytearray(1 << precision)
+
+  def add(self, name):
+    """
+    add adds name, names added before do not change the estimate.
+    """
+    hashed = int(hashlib.md5(name).hexdigest()[:16], 16)
+    bits = 64 - self.precision
+    register = hashed >> bits
+    rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+    if rank > self.registers[register]:
+      self.registers[register] = rank
+    return
+
+  def merge(self, other):
+    """
+    merge adds all names of other, which has to have the same precision.
+    """
+    self.registers = bytearray(max(mine, theirs) for mine, theirs in itertools.izip(self.registers, other.registers))
+    return
+
+  def count(self):
+    """
+    count gives the estimated number of different names.
+    """
+    size = len(self.registers)
+    estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in self.registers)
+    zeros = self.registers.count('\0')
+    if estimate <= 2.5 * size and zeros:
+      # few names, counting the empty registers is more accurate
+      estimate = size * math.log(size / float(zeros))
+    return int(round(estimate))
+
+
+class QuantileSketch:
+  """
+  The QuantileSketch class estimates the quantiles (i.e. the median) of the values added to it in constant memory: the values are counted in buckets whose bounds grow by a constant factor, s.t. each quantile is given with a relative error of at most accuracy. Sketches are merged by adding the counts of each bucket, so like HyperLogLog the result does not depend on the order of adding and merging.
+  """
+  def __init__(self, accuracy=0.01):
+    self.gamma = (1 + accuracy) / (1 - accuracy)
+    # the number of values in each bucket {bucket: number}, bucket i holds the values from gamma**(i-1) to gamma**i
+    self.buckets = {}
+    # the number of values not above 0
+    self.zeros = 0
+    self.total = 0
+
+  def add(self, value):
+    """
+    add counts a single value.
+    """
+    self.total += 1
+    if value <= 0:
+      self.zeros += 1
+      return
+    bucket = int(math.ceil(math.log(value) / math.log(self.gamma)))
+    self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    return
+
+  def merge(self, other):
+    """
+    merge adds all values of other, which has to have the same accuracy.
+    """
+    for bucket, number in other.buckets.iteritems():
+      self.buckets[bucket] = self.buckets.get(bucket, 0) + number
+    self.zeros += other.zeros
+    self.total += other.total
+    return
+
+  def quantile(self, fraction):
+    """
+    quantile gives the value below which fraction (between 0 and 1) of the values are, None if there are no values.
+    """
+    if not self.total:
+      return None
+    rank = fraction * (self.total - 1)
+    seen = self.zeros
+    if rank < seen:
+      return 0
+    for bucket in sorted(self.buckets):
+      seen += self.buckets[bucket]
+      if rank < seen:
+        # the middle of the bucket, this is at most accuracy off from any value in it
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+    return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class Sketches:
+  """
+  The Sketches class keeps a HyperLogLog of the users online and a QuantileSketch of the length of the sessions for each day, days are given by their number since 1970-01-01. The sketches of any days (i.e. of a week or month) can be merged, their memory does not grow with the number of users or sessions.
+  """
+  def __init__(self):
+    # the users online on each day {day: HyperLogLog}
+    self.users = {}
+    # the length of the sessions which ended on each day {day: QuantileSketch}
+    self.sessions = {}
+
+  def add_session(self, name, start, end):
+    """
+    add_session adds a session of the user name from start to end. The user is counted on each day the session covers, its length on the day it ends.
+    """
+    self.add_online(name, start, end)
+    self.add_length(end, end - start)
+    return
+
+  def add_online(self, name, start, end):
+    """
+    add_online counts the user name on each day from start to end, the session is not finished yet, so its length is not known.
+    """
+    day = start // 86400
+    while day <= end // 86400:
+      if day not in self.users:
+        self.users[day] = HyperLogLog()
+      self.users[day].add(name)
+      day += 1
+    return
+
+  def add_length(self, end, length):
+    """
+    add_length adds the length of a session which ended at end.
+    """
+    day = end // 86400
+    if day not in self.sessions:
+      self.sessions[day] = QuantileSketch()
+    self.sessions[day].add(length)
+    return
+
+  def merge(self, other):
+    """
+    merge adds the sketches of other, i.e. of a single logfile or of another server.
+    """
+    for sketches, others, new in ((self.users, other.users, HyperLogLog), (self.sessions, other.sessions, QuantileSketch)):
+      for day, sketch in others.iteritems():
+        if day not in sketches:
+          sketches[day] = new()
+        sketches[day].merge(sketch)
+    return
+
+  def count_users(self, days):
+    """
+    count_users gives the estimated number of different users online on any of days.
+    """
+    users = HyperLogLog()
+    for day in days:
+      if day in self.users:
+        users.merge(self.users[day])
+    return users.count()
+
+  def session_lengths(self, days=None):
+    """
+    session_lengths gives a QuantileSketch of the length of the sessions which ended on any of days, all days if not given.
+    """
+    if days is None:
+      days = self.sessions.keys()
+    lengths = QuantileSketch()
+    for day in days:
+      if day in self.sessions:
+        lengths.merge(self.sessions[day])
+    return lengths
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class Aggregator:
+  """
+  The Aggregator class collects all enabled statistics in a single pass over the logfiles. Every line is classified once by tokenize_line and the resulting event is handed to all enabled statistics at the same time.
+  The sessions of the users are ended by their logout, kick or lost connection, or by the server: a stop parts all users online, a start while users are still online means the server has crashed and they are parted at the line before (the last time the server was known to run). This works the same across logfiles, also when they are scanned separately and merged (see merge_file).
+  """
+
+  def __init__(self, chat=False, deaths=False, logins=False, online_time=False, deathlist=None, record=False, intervals=False, daily=False, sketches=False, patterns=None):
+    # the statistics which are to be collected
+    self.count_chat = chat
+    self.count_deaths = deaths
+    self.count_logins = logins
+    self.count_online_time = online_time
+    # the ids of the users, the results are indexed by them
+    self.users = UserTable()
+    # the results, each one is an array with a value for each user id
+    self.chat_counts = array.array('i')
+    self.death_counts = array.array('i')
+    self.login_counts = array.array('i')
+    # online time is in seconds, -1 for users which have never been online
+    self.online_seconds = array.array('l')
+    # the number of deaths for each cause {cause: value}
+    self.death_causes = {}
+    # the number of lines found for each event, indexed by the value of the event (see Event)
+    self.event_counts = array.array('l', [0] * len(Event.names))
+    # the users which are online at the moment {user id: time of login}
+    self.online = {}
+    # the last point in time the server was known to be running and the one before, i.e. of the line before
+    self.last_time = None
+    self.previous_time = None
+    # the midnight of the day the current line is from and its time of day, to find out when midnight passes
+    self.midnight = 0
+    self.day_seconds = 0
+    # these describe the current logfile, they are needed to merge FileStats (see FileStats)
+    self.carry = {}
+    # an EventStore to record all events and sessions into, None if they are not recorded
+    self.store = None
+    if record:
+      self.store = EventStore(self.users)
+    # the sessions and runs of the server as Intervals, None if they are not kept
+    self.intervals = None
+    # the start of the current run of the server, None if it is not running or not known
+    self.run_start = None
+    # the first start or stop of the server in the current logfile, as (event, time the run before ended), see FileStats
+    self.run_head = None
+    # the number of other events at the last start, the server writes several start lines for a single start
+    self.run_events = None
+    if intervals:
+      self.intervals = Intervals()
+    # the activity of each user on each day as a DailyRollup, None if it is not kept
+    self.daily = None
+    if daily:
+      self.daily = DailyRollup()
+    # the users online and the length of the sessions on each day as Sketches, None if they are not kept
+    self.sketches = None
+    if sketches:
+      self.sketches = Sketches()
+    # read the patterns of the events and the list of possible death causes only once, not for every logfile
+    if patterns is None:
+      patterns = read_patterns()
+    if not deaths:
+      patterns = [(event, pattern) for event, pattern in patterns if event != Event.death]
+      deathlist = []
+    elif deathlist is None:
+      deathlist = read_deathlist()
+    self.matcher = EventMatcher(patterns, deathlist)
+
+  def feed_logfile(self, logfile):
+    """
+    feed_logfile processes a single logfile and updates all enabled statistics.
+    logfile - the content of a single logfile as a string, as given by read_single_file
+    """
+    lines = logfile.split('\n')
+    timing.count('read', 'lines', len(lines))
+    # first line may contain the date inserted by read_single_file
+    file_date = None
+    if lines and self.matcher.line_seconds(lines[0]) is None:
+      file_date = re.search(Regex.file_date, lines.pop(0))
+      if file_date:
+        file_date = file_date.group()
+    self.feed_lines(file_date, lines)
+    return
+
+  def feed_lines(self, file_date, lines):
+    """
+    feed_lines processes the lines of a single logfile and updates all enabled statistics. The lines are consumed one at a time, so lines may be a generator as given by stream_logfiles.
+    file_date - the date of the logfile as 'YYYY-MM-DD', None if it is not known
+    lines - an iterable over the lines of the logfile
+    """
+    self.start_file(file_date)
+    for line in lines:
+      self.feed_line(line, tokenize_line(line, self.matcher))
+    return
+
+  def start_file(self, file_date):
+    """
+    start_file prepares for the lines of a new logfile, which are given to feed_line afterwards.
+    file_date - the date of the logfile as 'YYYY-MM-DD', None if it is not known
+    """
+    if not file_date:
+      # if the date is not known, it is assumed to be latest.log or test.log
+      if verbose:
+        print 'assuming the logfile is latest or test'
+      file_date = str(datetime.datetime.now().date())
+    # the date is needed only once for each logfile
+    self.midnight = date_seconds(file_date)
+    self.day_seconds = 0
+    self.carry = {}
+    self.run_head = None
+    self.run_events = None
+    return
+
+  def feed_line(self, line, token):
+    """
+    feed_line hands a single classified line of the logfile given to feed_lines to all enabled statistics.
+    line - a single line from a logfile
+    token - the result of tokenize_line for this line
+    """
+    if line == '':
+      return
+    if self.count_online_time:
+      seconds = self.matcher.line_seconds(line)
+      if seconds is None:
+        sys.stderr.write(FontStyle.bold +
+                         'process_online_time:\n\t'
+                         + FontStyle.normal +
+                         'line contains no date:\n\t'
+                         + line + '\n')
+        return
+      if seconds < self.day_seconds - 3600:
+        # the time jumped back by more than an hour (i.e. not just a clock adjustment), midnight has passed
+        self.midnight += 86400
+      self.day_seconds = seconds
+      time = self.midnight + seconds
+      # store time in case the server does an unclean shutdown (i.e. crash)
+      self.previous_time = self.last_time
+      self.last_time = time
+    if not token:
+      if verbose:
+        print 'line contained no known event\n\t', line
+      return
+    event, user, cause, message = token
+    self.event_counts[event] += 1
+    user_id = -1
+    if user is not None:
+      # the name is looked up only once, all results use its id
+      user_id = self.users.ids.get(user)
+      if user_id is None:
+        user_id = self.add_user(user)
+    if self.store is not None:
+      self.store.add(time, event, user_id, cause)
+      if event == Event.chat or event == Event.emote:
+        self.store.add_chat(time, event, user_id, message)
+    if self.daily is not None and user_id >= 0:
+      self.daily.add_event(user_id, time, event)
+    if event == Event.chat or event == Event.emote:
+      if self.count_chat:
+        self.chat_counts[user_id] += 1
+    elif event == Event.death:
+      if self.count_deaths:
+        self.death_counts[user_id] += 1
+        if cause in self.death_causes:
+          self.death_causes[cause] += 1
+        else:
+          self.death_causes[cause] = 1
+    elif event == Event.login:
+      if self.count_logins:
+        self.login_counts[user_id] += 1
+      if self.count_online_time:
+        self.join(user_id, time, line)
+    elif event == Event.stop:
+      if self.count_online_time:
+        self.end_run(event, time)
+    elif event == Event.start:
+      if self.count_online_time:
+        events = sum(self.event_counts) - self.event_counts[Event.start]
+        if events != self.run_events:
+          # a start while the server is running means it has crashed after the line before
+          self.end_run(event, self.previous_time)
+          self.run_start = time
+          self.run_events = events
+    else:
+      # logout, kick or connection lost
+      if self.count_online_time:
+        self.part(user_id, time, line)
+    return
+
+  def end_run(self, event, time):
+    """
+    end_run ends the current run of the server at time, because of event (a start or stop of the server), and parts all users still online.
+    time - the time of the stop, or the time of the line before the start (the server has crashed then), None if there is none
+    """
+    if self.run_head is None:
+      # the first start or stop in this logfile, needed to merge FileStats
+      self.run_head = (event, time)
+    if self.online:
+      if event == Event.start and verbose:
+        print 'unclean shutdown, parting users at last known time the server was running'
+      self.part_all(time)
+    if self.run_start is not None and time is not None:
+      if self.intervals is not None:
+        self.intervals.add_run(self.run_start, time)
+      if self.store is not None:
+        self.store.add_run(self.run_start, time)
+    self.run_start = None
+    return
+
+  def add_user(self, user):
+    """
+    add_user interns the name of a new user and makes room for it in all results.
+    Returns the id of the user.
+    """
+    user_id = self.users.intern(user)
+    while len(self.chat_counts) <= user_id:
+      self.chat_counts.append(0)
+      self.death_counts.append(0)
+      self.login_counts.append(0)
+      self.online_seconds.append(-1)
+    return user_id
+
+  def join(self, user, time, line):
+    """
+    join marks user (an id) as online from time on.
+    """
+    if user in self.online:
+      # this should not happen
+      sys.stderr.write(FontStyle.bold +
+                       'process_online_time:\n\t'
+                       + FontStyle.normal +
+                       'user logs in, although already online:\n\t'
+                       + line + '\n')
+    if user not in self.carry and self.run_head is None:
+      # first event of user in this logfile
+      self.carry[user] = (True, time)
+    self.online[user] = time
+    return
+
+  def part(self, user, time, line):
+    """
+    part marks user (an id) as offline from time on and adds the time since the login to the online time of user.
+    """
+    if user in self.online:
+      # user was online, is now parting
+      self.close_session(user, self.online.pop(user), time)
+    else:
+      if verbose:
+        print 'redundant part message', line
+    if user not in self.carry and self.run_head is None:
+      # first event of user in this logfile
+      self.carry[user] = (False, time)
+    return
+
+  def part_all(self, time):
+    """
+    part_all marks all users as offline from time on, this is used when the server stops.
+    """
+    for user in self.online:
+      self.close_session(user, self.online[user], time)
+    self.online = {}
+    return
+
+  def close_session(self, user, start, end):
+    """
+    close_session adds a session of user (an id) from start to end to the online time and records it in the EventStore.
+    """
+    self.add_online_time(user, end - start)
+    if self.store is not None:
+      self.store.add_session(user, start, end)
+    if self.intervals is not None:
+      self.intervals.add_session(user, start, end)
+    if self.daily is not None:
+      self.daily.add_session(user, start, end)
+    if self.sketches is not None:
+      self.sketches.add_session(self.users.names[user], start, end)
+    return
+
+  def add_online_time(self, user, duration):
+    """
+    add_online_time adds duration seconds to the online time of user (an id).
+    """
+    if self.online_seconds[user] < 0:
+      # this was the first time, the user was online
+      self.online_seconds[user] = duration
+    else:
+      # user has been online before
+      self.online_seconds[user] += duration
+    return
+
+  def merge_file(self, stats):
+    """
+    merge_file adds the statistics of a single logfile, which have been calculated separately, to the statistics collected so far. As long as the logfiles are merged in order, the result is the same as if the logfiles had been fed one after another.
+    stats - the FileStats of the logfile, as given by scan_logfile
+    """
+    # the ids of the users of the logfile are mapped to the ids used here
+    ids = [self.user_id(user) for user in stats.users.names]
+    self.add_counts(stats, ids)
+    if not self.count_online_time:
+      return
+    # users still online from the previous logfile are parted by their first event in this logfile, if it comes before the first start or stop
+    for user, (login, time) in stats.carry.iteritems():
+      user = ids[user]
+      if user in self.online:
+        from_time = self.online.pop(user)
+        if login:
+          # this should not happen, the new login replaces the old one
+          sys.stderr.write(FontStyle.bold +
+                           'process_online_time:\n\t'
+                           + FontStyle.normal +
+                           'user logs in, although already online:\n\t'
+                           + self.users.names[user] + '\n')
+        else:
+          self.close_session(user, from_time, time)
+    if stats.run_head is not None:
+      # the other users are parted by the first start or stop, which ends the run of the previous logfiles
+      event, time = stats.run_head
+      if time is None:
+        # the logfile begins with a start, the server crashed after the last line before
+        time = self.last_time
+      self.end_run(event, time)
+      self.run_start = stats.run_start
+    for user, seconds in enumerate(stats.online_seconds):
+      if seconds >= 0:
+        self.add_online_time(ids[user], seconds)
+    if self.store is not None and stats.store is not None:
+      self.store.extend(stats.store, ids)
+    if self.intervals is not None and stats.intervals is not None:
+      self.intervals.extend(stats.intervals, ids)
+    if self.daily is not None and stats.daily is not None:
+      self.daily.extend(stats.daily, ids)
+    if self.sketches is not None and stats.sketches is not None:
+      self.sketches.merge(stats.sketches)
+    for user in stats.open:
+      self.online[ids[user]] = stats.open[user]
+    if stats.last_time is not None:
+      self.last_time = stats.last_time
+    return
+
+  def add_counts(self, other, ids):
+    """
+    add_counts adds the chats, deaths, death causes and logins of other (a FileStats or Aggregator) to the enabled statistics.
+    ids - the ids used here for the ids of other
+    """
+    for event, number in enumerate(other.event_counts):
+      self.event_counts[event] += number
+    for mine, theirs, enabled in ((self.chat_counts, other.chat_counts, self.count_chat),
+                                  (self.death_counts, other.death_counts, self.count_deaths),
+                                  (self.login_counts, other.login_counts, self.count_logins)):
+      if not enabled:
+        continue
+      for user, value in enumerate(theirs):
+        if value:
+          mine[ids[user]] += value
+    if self.count_deaths:
+      for cause in other.death_causes:
+        if cause in self.death_causes:
+          self.death_causes[cause] += other.death_causes[cause]
+        else:
+          self.death_causes[cause] = other.death_causes[cause]
+    return
+
+  def add_server(self, other, include_online=False):
+    """
+    add_server adds the statistics of another server, whose logfiles form a timeline of their own. The values of each user are added up, sessions are not stitched across servers.
+    other - the Aggregator of the other server
+    include_online - if True, the users online on the other server are counted as online until its last line
+    """
+    ids = [self.user_id(user) for user in other.users.names]
+    self.add_counts(other, ids)
+    if self.intervals is not None and other.intervals is not None:
+      intervals = other.get_intervals(include_online)
+      self.intervals.extend(intervals, ids)
+    if self.daily is not None and other.daily is not None:
+      self.daily.extend(other.get_daily(include_online), ids)
+    if self.sketches is not None and other.sketches is not None:
+      # the users are counted by their names, so a user online on several servers is counted once
+      self.sketches.merge(other.get_sketches(include_online))
+    if self.count_online_time:
+      for user, seconds in enumerate(other.get_online_seconds(include_online)):
+        if seconds >= 0:
+          self.add_online_time(ids[user], seconds)
+    # the network is known to run until the last line of any server, the online share depends on it (see daily_sections)
+    if other.last_time is not None and (self.last_time is None or other.last_time > self.last_time):
+      self.last_time = other.last_time
+    return
+
+  def get_state(self):
+    """
+    get_state gives what is needed to continue with the logfiles after the ones read so far, i.e. in a later run (see set_state and EventStore): {'online': {user: time of login}, 'last_time', 'run_start'}. The users are given by their names.
+    """
+    return {'online': dict((self.users.names[user], time) for user, time in self.online.iteritems()),
+            'last_time': self.last_time, 'run_start': self.run_start}
+
+  def set_state(self, state):
+    """
+    set_state continues from the end of the logfiles read before, as given by get_state. The users still online then are parted by the logfiles read afterwards, the same way as if all logfiles were read at once.
+    """
+    for user, time in state['online'].iteritems():
+      self.online[self.user_id(user)] = time
+    self.last_time = state['last_time']
+    self.run_start = state['run_start']
+    return
+
+  def user_id(self, user):
+    """
+    user_id gives the id of the user with the name user, new users are added.
+    """
+    user_id = self.users.ids.get(user)
+    if user_id is None:
+      user_id = self.add_user(user)
+    return user_id
+
+  def by_name(self, values, present=None):
+    """
+    by_name gives the values of an array indexed by user id as a dictionary {user: value}.
+    present - a function telling whether a value is to be included, by default values which are not 0
+    """
+    if present is None:
+      return dict((user, value) for user, value in itertools.izip(self.users.names, values) if value)
+    return dict((user, value) for user, value in itertools.izip(self.users.names, values) if present(value))
+
+  def get_chats(self):
+    """
+    get_chats gives the number of chat messages and emotes of each user {user: number}.
+    """
+    return self.by_name(self.chat_counts)
+
+  def get_deaths(self):
+    """
+    get_deaths gives the number of deaths of each user {user: number}.
+    """
+    return self.by_name(self.death_counts)
+
+  def get_logins(self):
+    """
+    get_logins gives the number of logins of each user {user: number}.
+    """
+    return self.by_name(self.login_counts)
+
+  def get_online_seconds(self, include_online=False):
+    """
+    get_online_seconds gives the online time in seconds as an array indexed by user id, -1 for users which have never been online.
+    include_online - if True, the users which are online at the moment are counted as online until the last line
+    """
+    seconds = self.online_seconds
+    if include_online and self.online:
+      seconds = array.array(seconds.typecode, seconds)
+      for user in self.online:
+        seconds[user] = max(seconds[user], 0) + self.last_time - self.online[user]
+    return seconds
+
+  def get_intervals(self, include_online=False):
+    """
+    get_intervals gives the sessions and runs of the server as Intervals. The current run of the server is included up to the last line.
+    include_online - if True, the sessions of the users which are online at the moment are included up to the last line
+    """
+    intervals = Intervals()
+    intervals.extend(self.intervals, range(len(self.users.names)))
+    if include_online:
+      for user in self.online:
+        intervals.add_session(user, self.online[user], self.last_time)
+    if self.run_start is not None:
+      intervals.add_run(self.run_start, self.last_time)
+    return intervals
+
+  def get_daily(self, include_online=False):
+    """
+    get_daily gives the activity of each user on each day as a DailyRollup.
+    include_online - if True, the sessions of the users which are online at the moment are included up to the last line
+    """
+    if not include_online or not self.online:
+      return self.daily
+    daily = DailyRollup()
+    daily.extend(self.daily, range(len(self.users.names)))
+    for user in self.online:
+      daily.add_session(user, self.online[user], self.last_time)
+    return daily
+
+  def get_sketches(self, include_online=False):
+    """
+    get_sketches gives the users online and the length of the sessions on each day as Sketches.
+    include_online - if True, the users which are online at the moment are counted until the last line, the length of their sessions is not known yet
+    """
+    if not include_online or not self.online:
+      return self.sketches
+    sketches = Sketches()
+    sketches.merge(self.sketches)
+    for user in self.online:
+      sketches.add_online(self.users.names[user], self.online[user], self.last_time)
+    return sketches
+
+  def get_online_time(self, include_online=False):
+    """
+    get_online_time gives the online time of each user as a timedelta {user: timedelta}.
+    include_online - if True, the users which are online at the moment are counted as online until the last line
+    """
+    seconds = self.by_name(self.get_online_seconds(include_online), lambda value: value >= 0)
+    for user in seconds:
+      seconds[user] = datetime.timedelta(seconds=seconds[user])
+    return seconds
+
+  def get_by_logins(self, counts):
+    """
+    get_by_logins divides the values of counts by the number of logins of each user {user: value per login}.
+    counts - an array indexed by user id, i.e. chat_counts or death_counts
+    """
+    return dict((user, count / float(logins)) for user, count, logins
+                in itertools.izip(self.users.names, counts, self.login_counts) if count and logins)
+
+  def get_by_time(self, counts, include_online=False):
+    """
+    get_by_time divides the online time of each user by the values of counts {user: timedelta per value}.
+    counts - an array indexed by user id, i.e. chat_counts, death_counts or login_counts
+    include_online - as for get_online_seconds
+    """
+    return dict((user, datetime.timedelta(seconds=seconds / float(count))) for user, count, seconds
+                in itertools.izip(self.users.names, counts, self.get_online_seconds(include_online)) if count and seconds >= 0)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class FileStats:
+  """
+  The FileStats class holds the statistics of a single logfile, calculated without knowing any of the other logfiles. Besides the results, it keeps what is needed to continue the online time of users still online from the previous logfile:
+  All times are seconds since 1970-01-01 (see date_seconds), users are given by their ids in users.
+  open - the users still online at the end of the logfile {user: time of login}
+  last_time - the last point in time the server was known to be running
+  carry - the first join or part of each user before the first start or stop of the server {user: (is login, time)}
+  store - the EventStore of the logfile, None if the events are not recorded
+  intervals - the Intervals of the logfile, None if they are not kept
+  run_start - the start of the run of the server at the end of the logfile, None if it is not running
+  run_head - the first start or stop of the server as (event, time the run before ended), None if there is none. The time is None if the logfile begins with a start. The users still online from the logfiles before are parted then.
+  daily - the DailyRollup of the logfile, None if it is not kept
+  sketches - the Sketches of the logfile, None if they are not kept
+  """
+  def __init__(self, aggregator):
+    self.users = aggregator.users
+    self.chat_counts = aggregator.chat_counts
+    self.death_counts = aggregator.death_counts
+    self.death_causes = aggregator.death_causes
+    self.event_counts = aggregator.event_counts
+    self.login_counts = aggregator.login_counts
+    self.online_seconds = aggregator.online_seconds
+    self.open = aggregator.online
+    self.last_time = aggregator.last_time
+    self.carry = aggregator.carry
+    self.store = aggregator.store
+    self.intervals = aggregator.intervals
+    self.run_start = aggregator.run_start
+    self.run_head = aggregator.run_head
+    self.daily = aggregator.daily
+    self.sketches = aggregator.sketches
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def scan_logfile(file_date, lines, chat=True, deaths=True, logins=True, online_time=True, deathlist=None, record=False, intervals=False, daily=False, sketches=False, patterns=None):
+  """
+  scan_logfile calculates the statistics of a single logfile on its own, they can be merged with Aggregator.merge_file.
+  file_date - the date of the logfile as 'YYYY-MM-DD', None if it is not known
+  lines - an iterable over the lines of the logfile
+  chat, deaths, logins, online_time - which statistics to calculate
+  deathlist - a list of death messages as given by read_deathlist, read from disk if not given
+  record - if True, all events are recorded in an EventStore
+  intervals - if True, the sessions and runs of the server are kept as Intervals
+  daily - if True, the activity of each user on each day is kept as a DailyRollup
+  sketches - if True, the users online and the length of the sessions on each day are kept as Sketches
+  patterns - a list of patterns of the events as given by read_patterns, read from disk if not given
+  Returns a FileStats.
+  """
+  aggregator = Aggregator(chat, deaths, logins, online_time, deathlist, record, intervals, daily, sketches, patterns)
+  aggregator.feed_lines(file_date, lines)
+  return FileStats(aggregator)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def scan_logfile_job(job):
+  """
+  scan_logfile_job reads and scans a single logfile, it is used by the worker processes of process_logfiles.
+  job - a tuple (filename, file_date, chat, deaths, logins, online_time, deathlist, record, intervals, daily, sketches, patterns)
+  Returns a FileStats.
+  """
+  filename, file_date, chat, deaths, logins, online_time, deathlist, record, intervals, daily, sketches, patterns = job
+  return scan_logfile(file_date, stream_single_file(filename), chat, deaths, logins, online_time, deathlist, record, intervals, daily, sketches, patterns)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class StatsCache:
+  """
+  The StatsCache class stores the FileStats of each logfile in a sqlite database, keyed by the path, size and modification time of the logfile. Rotated logfiles never change, so each of them has to be processed only once. Logfiles without a date in their name (i.e. latest.log) are never cached, as they are still growing and their date is not known.
+  """
+  # increment this when FileStats changes, old entries will not be used anymore
+  format_version = 7
+
+  def __init__(self, filename, deathlist, record=False, intervals=False, daily=False, sketches=False, patterns=()):
+    self.connection = sqlite3.connect(filename)
+    self.connection.execute('CREATE TABLE IF NOT EXISTS filestats '
+                            '(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, version TEXT, stats BLOB)')
+    # a changed deathlist or changed patterns give different results for the same logfile
+    patterns = ['%s %s' % ('header' if event is None else Event.names[event], pattern) for event, pattern in patterns]
+    self.version = '%d-%s' % (self.format_version, hashlib.md5('\n'.join(deathlist + patterns)).hexdigest())
+    if record:
+      # FileStats with events are kept apart from those without
+      self.version += '-events'
+    if intervals:
+      self.version += '-intervals'
+    if daily:
+      self.version += '-daily'
+    if sketches:
+      self.version += '-sketches'
+
+  def key(self, filename):
+    """
+    key gives the absolute path, the size and the modification time of filename.
+    """
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime
+
+  def get(self, filename):
+    """
+    get gives the cached FileStats of filename, None if there are none or the logfile has changed since.
+    """
+    path, size, mtime = self.key(filename)
+    row = self.connection.execute('SELECT stats FROM filestats WHERE path = ? AND size = ? AND mtime = ? AND version = ?',
+                                  (path, size, mtime, self.version)).fetchone()
+    if row:
+      return cPickle.loads(str(row[0]))
+    return None
+
+  def put(self, filename, stats):
+    """
+    put stores the FileStats of filename, replacing older entries of this logfile.
+    """
+    path, size, mtime = self.key(filename)
+    self.connection.execute('INSERT OR REPLACE INTO filestats VALUES (?, ?, ?, ?, ?)',
+                            (path, size, mtime, self.version,
+                             sqlite3.Binary(cPickle.dumps(stats, cPickle.HIGHEST_PROTOCOL))))
+    return
+
+  def close(self):
+    self.connection.commit()
+    self.connection.close()
+    return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class EventStore:
+  """
+  The EventStore class keeps all events found in the logfiles as columns of compact arrays, one row per event: the time (seconds since 1970-01-01, 64 bit), the id of the user (32 bit, see UserTable, -1 for server events), the type of event (8 bit, see Event) and the id of the cause of a death (16 bit, 0 for other events). The names of causes are kept once, in a list indexed by their id. The sessions of the users are kept the same way, as user, start and end, and the runs of the server as start and end. The text of chat messages and emotes is kept with their time, user and type of event until the store is saved, each save adds them to the chat index as a new segment (see save_chat), which is searched with a ChatIndex.
+  Before the store is saved, sort groups the rows by type of event and orders them by time within each group. query can then find the events of a time range by bisection and count them without looking at any other row.
+  """
+  # the columns and their typecodes for the array module
+  columns = (('times', 'l'), ('user_column', 'i'), ('events', 'B'), ('causes', 'H'),
+             ('session_users', 'i'), ('session_starts', 'l'), ('session_ends', 'l'), ('run_starts', 'l'), ('run_ends', 'l'))
+  # the columns of the chat messages which are not saved yet, these are not needed by query and are read by ChatIndex only
+  chat_columns = (('chat_times', 'l'), ('chat_users', 'i'), ('chat_events', 'B'))
+
+  def __init__(self, users=None):
+    for name, typecode in self.columns + self.chat_columns:
+      setattr(self, name, array.array(typecode))
+    # the text of the chat messages which are not saved yet, in the order of chat_times
+    self.chat_messages = []
+    # the ids of the users, this may be shared with an Aggregator
+    if users is None:
+      users = UserTable()
+    self.users = users
+    # the names of the causes, the id is the index in this list
+    self.cause_names = [None]
+    self.cause_ids = {None: 0}
+    # the rows of each type of event after sort {event: (first row, last row + 1)}
+    self.offsets = None
+    # the longest session, to know how far back sessions overlapping a time range may start
+    self.longest_session = 0
+    # the absolute paths of the logfiles whose events are in the store, each one is added only once (see open_event_store)
+    self.logfiles = []
+    # the state at the end of these logfiles, the sessions still open then are continued by the next ones (see Aggregator.get_state)
+    self.state = None
+
+  def __getstate__(self):
+    # arrays are pickled as strings, this is much smaller and faster than lists of numbers
+    state = dict(self.__dict__)
+    for name, typecode in self.columns + self.chat_columns:
+      state[name] = getattr(self, name).tostring()
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    for name, typecode in self.columns + self.chat_columns:
+      column = array.array(typecode)
+      column.fromstring(state[name])
+      setattr(self, name, column)
+
+  def cause_id(self, cause):
+    """
+    cause_id gives the id of a cause of death, cause_id(None) is 0.
+    """
+    if cause not in self.cause_ids:
+      self.cause_ids[cause] = len(self.cause_names)
+      self.cause_names.append(cause)
+    return self.cause_ids[cause]
+
+  def add(self, time, event, user, cause):
+    """
+    add records a single event of user (an id of users, -1 for none).
+    """
+    self.times.append(time)
+    self.user_column.append(user)
+    self.events.append(event)
+    self.causes.append(self.cause_id(cause))
+    self.offsets = None
+    return
+
+  def add_session(self, user, start, end):
+    """
+    add_session records a session of user (an id of users) from start to end.
+    """
+    self.session_users.append(user)
+    self.session_starts.append(start)
+    self.session_ends.append(end)
+    self.longest_session = max(self.longest_session, end - start)
+    return
+
+  def add_run(self, start, end):
+    """
+    add_run records a run of the server from its start to its stop (or crash).
+    """
+    self.run_starts.append(start)
+    self.run_ends.append(end)
+    return
+
+  def add_chat(self, time, event, user, message):
+    """
+    add_chat records the text of a chat message or emote (given by event) of user (an id of users).
+    """
+    self.chat_times.append(time)
+    self.chat_users.append(user)
+    self.chat_events.append(event)
+    self.chat_messages.append(message)
+    return
+
+  def extend(self, other, ids=None):
+    """
+    extend appends all events and sessions of another EventStore, i.e. the one of a single logfile.
+    ids - the ids in users for the ids of the other EventStore, if they are known already
+    """
+    users = ids
+    if users is None:
+      users = [self.users.intern(user) for user in other.users.names]
+    causes = [self.cause_id(cause) for cause in other.cause_names]
+    self.times.extend(other.times)
+    self.user_column.extend(array.array('i', [users[user] if user >= 0 else -1 for user in other.user_column]))
+    self.events.extend(other.events)
+    self.causes.extend(array.array('H', [causes[cause] for cause in other.causes]))
+    self.session_users.extend(array.array('i', [users[user] for user in other.session_users]))
+    self.session_starts.extend(other.session_starts)
+    self.session_ends.extend(other.session_ends)
+    self.run_starts.extend(other.run_starts)
+    self.run_ends.extend(other.run_ends)
+    self.chat_times.extend(other.chat_times)
+    self.chat_users.extend(array.array('i', [users[user] for user in other.chat_users]))
+    self.chat_events.extend(other.chat_events)
+    self.chat_messages.extend(other.chat_messages)
+    self.longest_session = max(self.longest_session, other.longest_session)
+    self.offsets = None
+    return
+
+  def sort(self):
+    """
+    sort groups the events by their type and orders them by time within each group, the sessions and runs are ordered by their start and the chat messages by their time.
+    """
+    rows = {}
+    for row, event in enumerate(self.events):
+      rows.setdefault(event, []).append(row)
+    order = []
+    self.offsets = {}
+    for event in sorted(rows):
+      # the sort is stable, so events of the same second stay in the order of the logfiles
+      rows[event].sort(key=self.times.__getitem__)
+      self.offsets[event] = (len(order), len(order) + len(rows[event]))
+      order.extend(rows[event])
+    for name in ('times', 'user_column', 'events', 'causes'):
+      column = getattr(self, name)
+      setattr(self, name, array.array(column.typecode, [column[row] for row in order]))
+    order = sorted(xrange(len(self.session_starts)), key=self.session_starts.__getitem__)
+    for name in ('session_users', 'session_starts', 'session_ends'):
+      column = getattr(self, name)
+      setattr(self, name, array.array(column.typecode, [column[row] for row in order]))
+    order = sorted(xrange(len(self.run_starts)), key=self.run_starts.__getitem__)
+    for name in ('run_starts', 'run_ends'):
+      column = getattr(self, name)
+      setattr(self, name, array.array(column.typecode, [column[row] for row in order]))
+    order = sorted(xrange(len(self.chat_times)), key=self.chat_times.__getitem__)
+    for name, typecode in self.chat_columns:
+      column = getattr(self, name)
+      setattr(self, name, array.array(column.typecode, [column[row] for row in order]))
+    self.chat_messages = [self.chat_messages[row] for row in order]
+    return
+
+  def save(self, directory):
+    """
+    save writes the store into directory, each column into its own file.
+    """
+    if self.offsets is None:
+      self.sort()
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    for name, typecode in self.columns:
+      column_file = open(os.path.join(directory, name), 'wb')
+      getattr(self, name).tofile(column_file)
+      column_file.close()
+    for name, names in (('user_names', self.users.names), ('cause_names', self.cause_names[1:])):
+      names_file = open(os.path.join(directory, name), 'w')
+      names_file.write('\n'.join(names))
+      names_file.close()
+    offsets_file = open(os.path.join(directory, 'offsets'), 'w')
+    offsets_file.write('longest_session %d\n' % self.longest_session)
+    for event in sorted(self.offsets):
+      offsets_file.write('%d %d %d\n' % ((event,) + self.offsets[event]))
+    offsets_file.close()
+    logfiles_file = open(os.path.join(directory, 'logfiles'), 'w')
+    logfiles_file.write(''.join(logfile + '\n' for logfile in self.logfiles))
+    logfiles_file.close()
+    if self.state is not None:
+      state_file = open(os.path.join(directory, 'state'), 'w')
+      json.dump(self.state, state_file)
+      state_file.close()
+    self.save_chat(directory)
+    return
+
+  def save_chat(self, directory):
+    """
+    save_chat writes the chat messages not saved before as a new segment of the chat index in directory, the segments saved before are not read or changed. Each segment has an inverted index for ChatIndex: for each word and for each user ('@' and the name), the numbers of the messages of the segment containing it (or written by the user), in the order of their time. The numbers are given as differences to the number before, as varints (see encode_postings).
+    The messages have to be sorted before, see sort. They are dropped from the store afterwards.
+    """
+    if not self.chat_times:
+      return
+    chat_directory = os.path.join(directory, 'chat')
+    if not os.path.isdir(chat_directory):
+      os.makedirs(chat_directory)
+    # the segments are numbered in the order they are saved
+    segment = os.path.join(chat_directory, str(len(chat_segments(directory))))
+    os.makedirs(segment)
+    for name, typecode in self.chat_columns:
+      column_file = open(os.path.join(segment, name), 'wb')
+      getattr(self, name).tofile(column_file)
+      column_file.close()
+    # the text of message number n is chat_text[chat_offsets[n]:chat_offsets[n + 1]]
+    chat_offsets = array.array('l', [0])
+    text_file = open(os.path.join(segment, 'chat_text'), 'wb')
+    postings = {}
+    for number, message in enumerate(self.chat_messages):
+      text_file.write(message)
+      chat_offsets.append(chat_offsets[-1] + len(message))
+      for term in set(Regex.word.findall(message.lower())):
+        if term in postings:
+          postings[term].append(number)
+        else:
+          postings[term] = [number]
+    text_file.close()
+    offsets_file = open(os.path.join(segment, 'chat_offsets'), 'wb')
+    chat_offsets.tofile(offsets_file)
+    offsets_file.close()
+    for number, user in enumerate(self.chat_users):
+      postings.setdefault('@' + self.users.names[user], []).append(number)
+    # each line of chat_terms gives a term and the position of its postings in chat_postings
+    postings_file = open(os.path.join(segment, 'chat_postings'), 'wb')
+    terms_file = open(os.path.join(segment, 'chat_terms'), 'w')
+    position = 0
+    for term in sorted(postings):
+      data = encode_postings(postings[term])
+      postings_file.write(data)
+      terms_file.write('%s %d %d\n' % (term, position, len(data)))
+      position += len(data)
+    postings_file.close()
+    terms_file.close()
+    for name, typecode in self.chat_columns:
+      setattr(self, name, array.array(typecode))
+    self.chat_messages = []
+    return
+
+  def rows(self, event, since, until):
+    """
+    rows gives the rows of the events of one type between since and until as (first row, last row + 1), they are found by bisection.
+    event - the type of event, see Event
+    since, until - the time range in seconds since 1970-01-01, until is not included, None for no limit
+    """
+    first, last = self.offsets.get(event, (0, 0))
+    if since is not None:
+      first = bisect.bisect_left(self.times, since, first, last)
+    if until is not None:
+      last = bisect.bisect_left(self.times, until, first, last)
+    return first, last
+
+  def count(self, event, since, until, column):
+    """
+    count gives the number of events of one type between since and until for each value of column {value: number}.
+    event - the type of event, see Event
+    since, until - the time range in seconds since 1970-01-01, until is not included, None for no limit
+    column - the column of which the values are counted, i.e. self.user_column or self.causes
+    """
+    first, last = self.rows(event, since, until)
+    # sorting is done by the interpreter, afterwards each different value is counted by bisection
+    values = sorted(column[first:last])
+    counts = {}
+    for value in set(values):
+      counts[value] = bisect.bisect_right(values, value) - bisect.bisect_left(values, value)
+    return counts
+
+  def clip(self, start, end, since, until):
+    """
+    clip cuts a session or run from start to end to the time range from since to until (see query). Sessions of no length within the range are kept, like when the logfiles are read.
+    Returns (start, end) or None, if it is outside the range.
+    """
+    if until is not None:
+      if start >= until:
+        return None
+      end = min(end, until)
+    if since is not None:
+      if end < since or (end == since and start < since):
+        return None
+      start = max(start, since)
+    return start, end
+
+  def query(self, since=None, until=None, intervals=False, daily=False, sketches=False):
+    """
+    query calculates all statistics for the events between since and until. Sessions and runs of the server overlapping the time range are cut to it.
+    since, until - the time range in seconds since 1970-01-01, until is not included, None for no limit
+    intervals - if True, the sessions and runs of the server are kept as Intervals (see Aggregator)
+    daily - if True, the activity of each user on each day is kept as a DailyRollup
+    sketches - if True, the users online and the length of the sessions on each day are kept as Sketches
+    Returns an Aggregator, like process_logfiles.
+    """
+    if self.offsets is None:
+      self.sort()
+    # the configured patterns and deathlist are used, s.t. the results can be followed (see --follow)
+    results = Aggregator(True, True, True, True, intervals=intervals, daily=daily, sketches=sketches)
+    # the results use the same ids as the events
+    for user in self.users.names:
+      results.user_id(user)
+    for events, result in (((Event.chat, Event.emote), results.chat_counts),
+                           ((Event.death,), results.death_counts),
+                           ((Event.login,), results.login_counts)):
+      for event in events:
+        for user, number in self.count(event, since, until, self.user_column).items():
+          result[user] += number
+    for cause, number in self.count(Event.death, since, until, self.causes).items():
+      results.death_causes[self.cause_names[cause]] = number
+    if daily:
+      # the events of each type are ordered by time, the rollup needs all of them in the order of their time (see DailyRollup.add_event)
+      rows = []
+      for event in self.offsets:
+        rows.extend(xrange(*self.rows(event, since, until)))
+      rows.sort(key=self.times.__getitem__)
+      for row in rows:
+        if self.user_column[row] >= 0:
+          results.daily.add_event(self.user_column[row], self.times[row], self.events[row])
+    # sessions overlapping the time range started at most longest_session before it
+    first = 0
+    if since is not None:
+      first = bisect.bisect_left(self.session_starts, since - self.longest_session)
+    last = len(self.session_starts)
+    if until is not None:
+      last = bisect.bisect_left(self.session_starts, until)
+    for row in xrange(first, last):
+      session = self.clip(self.session_starts[row], self.session_ends[row], since, until)
+      if session:
+        start, end = session
+        results.add_online_time(self.session_users[row], end - start)
+        if intervals:
+          results.intervals.add_session(self.session_users[row], start, end)
+        if daily:
+          results.daily.add_session(self.session_users[row], start, end)
+        if sketches:
+          results.sketches.add_session(self.users.names[self.session_users[row]], start, end)
+    if intervals:
+      # there are only a few runs, one for each start of the server
+      for start, end in itertools.izip(self.run_starts, self.run_ends):
+        run = self.clip(start, end, since, until)
+        if run:
+          results.intervals.add_run(*run)
+    if self.state is not None and until is None:
+      # the users online at the end of the stored logfiles, s.t. the results can be followed (see --follow)
+      state = dict(self.state)
+      if since is not None:
+        state['online'] = dict((user, max(time, since)) for user, time in state['online'].iteritems())
+        if state['run_start'] is not None:
+          state['run_start'] = max(state['run_start'], since)
+      results.set_state(state)
+    return results
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def load_event_store(directory):
+  """
+  load_event_store reads an EventStore, which has been saved into directory. The chat messages are not read, they are only needed by ChatIndex.
+  """
+  store = EventStore()
+  for name, typecode in EventStore.columns:
+    column_file = open(os.path.join(directory, name), 'rb')
+    column = getattr(store, name)
+    column.fromfile(column_file, os.fstat(column_file.fileno()).st_size // column.itemsize)
+    column_file.close()
+  names_file = open(os.path.join(directory, 'user_names'), 'r')
+  store.users = UserTable(line.rstrip('\n') for line in names_file)
+  names_file.close()
+  names_file = open(os.path.join(directory, 'cause_names'), 'r')
+  store.cause_names.extend(line.rstrip('\n') for line in names_file)
+  names_file.close()
+  store.cause_ids = dict((cause, cause_id) for cause_id, cause in enumerate(store.cause_names))
+  store.offsets = {}
+  offsets_file = open(os.path.join(directory, 'offsets'), 'r')
+  for line in offsets_file:
+    values = line.split()
+    if values[0] == 'longest_session':
+      store.longest_session = int(values[1])
+    else:
+      store.offsets[int(values[0])] = (int(values[1]), int(values[2]))
+  offsets_file.close()
+  if os.path.isfile(os.path.join(directory, 'logfiles')):
+    logfiles_file = open(os.path.join(directory, 'logfiles'), 'r')
+    store.logfiles = [line.rstrip('\n') for line in logfiles_file]
+    logfiles_file.close()
+  if os.path.isfile(os.path.join(directory, 'state')):
+    state_file = open(os.path.join(directory, 'state'), 'r')
+    store.state = json.load(state_file)
+    state_file.close()
+    # json gives unicode, the names of the users are kept as str
+    store.state['online'] = dict((user.encode('utf-8'), time) for user, time in store.state['online'].iteritems())
+  return store
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def open_event_store(directory, filenames):
+  """
+  open_event_store gives the EventStore saved in directory (an empty one, if there is none yet) and the logfiles of filenames which have to be added to it. Each logfile is added only once. Logfiles without a date in their name (i.e. latest.log) are not added at all, they are still growing and would be added again with their next lines.
+  directory - the directory given with --store
+  filenames - the logfiles given, as by find_logfiles
+  Returns a tuple (store, filenames).
+  """
+  if os.path.isfile(os.path.join(directory, 'offsets')):
+    store = load_event_store(directory)
+  else:
+    store = EventStore()
+  added = set(store.logfiles)
+  new_files = []
+  for filename in filenames:
+    if os.path.abspath(filename) in added:
+      if verbose:
+        print filename, 'is in the store already'
+    elif logfile_date(filename) is None:
+      sys.stderr.write(FontStyle.bold +
+                       'open_event_store:\n\t'
+                       + FontStyle.normal +
+                       'logfile has no date and is not added to the store:\n\t'
+                       + filename + '\n')
+    else:
+      new_files.append(filename)
+  return store, new_files
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def add_to_event_store(store, results, filenames):
+  """
+  add_to_event_store adds the events recorded in results (see process_logfiles) to store, as the ones of filenames. results has to continue from store.state, the state at the end of filenames is kept for the next ones.
+  """
+  store.extend(results.store)
+  store.logfiles.extend(os.path.abspath(filename) for filename in filenames)
+  store.state = results.get_state()
+  return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def encode_postings(numbers):
+  """
+  encode_postings gives a list of increasing numbers as a compact string: the difference of each number to the one before, as a varint (7 bits per byte, the highest bit is set on all but the last byte of a number).
+  """
+  data = bytearray()
+  last = 0
+  for number in numbers:
+    delta = number - last
+    last = number
+    while delta >= 0x80:
+      data.append(delta & 0x7f | 0x80)
+      delta >>= 7
+    data.append(delta)
+  return str(data)
+
+
+def decode_postings(data):
+  """
+  decode_postings gives the list of numbers encoded by encode_postings.
+  """
+  numbers = []
+  number = 0
+  delta = 0
+  shift = 0
+  for byte in bytearray(data):
+    delta |= (byte & 0x7f) << shift
+    if byte & 0x80:
+      shift += 7
+    else:
+      number += delta
+      numbers.append(number)
+      delta = 0
+      shift = 0
+  return numbers
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def chat_segments(directory):
+  """
+  chat_segments gives the directories of the segments of the chat index of the EventStore saved in directory, in the order they were saved (see EventStore.save_chat).
+  """
+  chat_directory = os.path.join(directory, 'chat')
+  if not os.path.isdir(chat_directory):
+    return []
+  numbers = sorted(int(name) for name in os.listdir(chat_directory) if name.isdigit())
+  return [os.path.join(chat_directory, str(number)) for number in numbers]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class ChatSegment:
+  """
+  The ChatSegment class reads a single segment of the chat index, i.e. the messages of the logfiles added to the store at once. Only the times, users, events and positions of the messages are read into memory, the text and the postings are mapped from their files and only the parts needed for a search are read.
+  """
+  def __init__(self, segment):
+    for name, typecode in EventStore.chat_columns + (('chat_offsets', 'l'),):
+      column_file = open(os.path.join(segment, name), 'rb')
+      column = array.array(typecode)
+      column.fromfile(column_file, os.fstat(column_file.fileno()).st_size // column.itemsize)
+      column_file.close()
+      setattr(self, name, column)
+    # the position of the postings of each term in chat_postings {term: (position, length)}
+    self.terms = {}
+    terms_file = open(os.path.join(segment, 'chat_terms'), 'r')
+    for line in terms_file:
+      term, position, length = line.split()
+      self.terms[term] = (int(position), int(length))
+    terms_file.close()
+    self.text = self.map_file(os.path.join(segment, 'chat_text'))
+    self.postings_data = self.map_file(os.path.join(segment, 'chat_postings'))
+
+  def map_file(self, filename):
+    """
+    map_file maps filename into memory read only, empty files can not be mapped and are given as an empty string.
+    """
+    mapped_file = open(filename, 'rb')
+    mapped = ''
+    if os.fstat(mapped_file.fileno()).st_size > 0:
+      mapped = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+    mapped_file.close()
+    return mapped
+
+  def postings(self, term):
+    """
+    postings gives the numbers of the messages containing term (or written by the user, for '@' and the name), in the order of their time.
+    """
+    position, length = self.terms[term]
+    return decode_postings(self.postings_data[position:position + length])
+
+  def message(self, number):
+    """
+    message gives the text of message number.
+    """
+    return self.text[self.chat_offsets[number]:self.chat_offsets[number + 1]]
+
+  def search(self, terms, user_id, since, until):
+    """
+    search finds the messages of this segment containing all terms, see ChatIndex.search.
+    terms - a set of words and '@' and the name of a user
+    user_id - the id of the user of '@' in terms, None if there is none
+    Returns a list of (time, user id, event, message), ordered by time.
+    """
+    first = 0
+    last = len(self.chat_times)
+    if since is not None:
+      first = bisect.bisect_left(self.chat_times, since)
+    if until is not None:
+      last = bisect.bisect_left(self.chat_times, until, first)
+    if any(term not in self.terms for term in terms):
+      return []
+    terms = set(terms)
+    if terms:
+      # only the shortest postings are read, the other terms are checked on the messages found there
+      term = min(terms, key=lambda term: self.terms[term][1])
+      terms.discard(term)
+      numbers = self.postings(term)
+      numbers = numbers[bisect.bisect_left(numbers, first):bisect.bisect_left(numbers, last)]
+    else:
+      numbers = xrange(first, last)
+    if user_id is not None:
+      terms = set(term for term in terms if not term.startswith('@'))
+    found = []
+    for number in numbers:
+      if user_id is not None and self.chat_users[number] != user_id:
+        continue
+      message = self.message(number)
+      if terms and not terms.issubset(Regex.word.findall(message.lower())):
+        continue
+      found.append((self.chat_times[number], self.chat_users[number], self.chat_events[number], message))
+    return found
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class ChatIndex:
+  """
+  The ChatIndex class searches the chat messages saved with an EventStore (see EventStore.save_chat), without reading the logfiles again. Each segment of the index is searched on its own (see ChatSegment), the messages found are merged by their time.
+  """
+  def __init__(self, directory):
+    names_file = open(os.path.join(directory, 'user_names'), 'r')
+    self.users = UserTable(line.rstrip('\n') for line in names_file)
+    names_file.close()
+    self.segments = [ChatSegment(segment) for segment in chat_segments(directory)]
+
+  def search(self, words='', player=None, since=None, until=None):
+    """
+    search finds the chat messages containing all words, in any order and case.
+    words - the words to search for, all messages if empty
+    player - if given, only the messages of this user are found
+    since, until - the time range in seconds since 1970-01-01, until is not included, None for no limit
+    Returns a list of (time, user, event, message), ordered by time. The event is Event.chat or Event.emote.
+    """
+    terms = set(Regex.word.findall(words.lower()))
+    user_id = None
+    if player is not None:
+      if player not in self.users.ids:
+        return []
+      terms.add('@' + player)
+      user_id = self.users.ids[player]
+    found = []
+    for segment in self.segments:
+      found.extend(segment.search(terms, user_id, since, until))
+    # the segments are mostly in order already, the sort is stable for messages of the same second
+    found.sort(key=lambda message: message[0])
+    return [(time, self.users.names[user], event, message) for time, user, event, message in found]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def parse_date(date):
+  """
+  parse_date gives a date 'YYYY-MM-DD' or a point in time 'YYYY-MM-DD HH:MM:SS' as seconds since 1970-01-01.
+  """
+  if ' ' in date:
+    date, day_time = date.split(' ', 1)
+    hours, minutes, seconds = day_time.split(':')
+    return date_seconds(date) + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+  return date_seconds(date)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def process_logs(raw_data, chat=False, deaths=False, logins=False, online_time=False):
+  """
+  Given a list of the content of valid minecraft logfiles, process_logs will calculate all requested statistics in a single pass over the logfiles.
+  raw_data - a list of logfiles, each logfile is a string containing the whole file
+  chat, deaths, logins, online_time - which statistics to calculate
+  Returns an Aggregator, the results are given by its get_chats, get_deaths, get_logins and get_online_time.
+  """
+  aggregator = Aggregator(chat, deaths, logins, online_time)
+  for logfile in raw_data:
+    aggregator.feed_logfile(logfile)
+  return aggregator
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def process_logfiles(filenames, chat=False, deaths=False, logins=False, online_time=False, cache=None, jobs=1, record=False, threads=0, intervals=False, daily=False, sketches=False, state=None):
+  """
+  Given a list of valid minecraft logfiles, process_logfiles will calculate all requested statistics in a single pass, reading the logfiles line by line with stream_logfiles.
+  filenames - a list of logfiles to process
+  chat, deaths, logins, online_time - which statistics to calculate
+  cache - the filename of a StatsCache, if given only logfiles which are not in the cache are read
+  jobs - the number of processes used to read the logfiles, each logfile is scanned on its own and the results are merged in order of the logfiles
+  record - if True, all events are recorded in the EventStore of the Aggregator, all statistics are calculated then
+  threads - the number of .gz logfiles decompressed in background threads ahead of the one being read, only used without cache and jobs
+  intervals - if True, the sessions and runs of the server are kept as Intervals, the online time is calculated then
+  daily - if True, the activity of each user on each day is kept as a DailyRollup, all statistics are calculated then
+  sketches - if True, the users online and the length of the sessions on each day are kept as Sketches, the online time is calculated then
+  state - the state at the end of the logfiles before filenames, as given by Aggregator.get_state, i.e. of the ones in an EventStore
+  Returns an Aggregator, the results are given by its get_chats, get_deaths, get_logins and get_online_time.
+  """
+  return process_servers([(None, filenames)], chat, deaths, logins, online_time, cache, jobs, record, threads, intervals, daily, sketches, [state])[0][1]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def process_servers(servers, chat=False, deaths=False, logins=False, online_time=False, cache=None, jobs=1, record=False, threads=0, intervals=False, daily=False, sketches=False, states=None):
+  """
+  process_servers calculates the statistics of several servers, like process_logfiles does for one. Each server has its own timeline, i.e. users online on one server are not affected by the logfiles of another one. With jobs, the logfiles of all servers are scanned by the same processes.
+  servers - a list of (name, filenames)
+  states - the state to continue from for each server (see process_logfiles), None to start each one from scratch
+  The other arguments are the same as for process_logfiles.
+  Returns a list of (name, Aggregator), in the order of servers.
+  """
+  if record or daily:
+    # all events are recorded or counted for each day
+    chat = deaths = logins = online_time = True
+  if intervals or sketches:
+    online_time = True
+  patterns = read_patterns()
+  results = [(name, Aggregator(chat, deaths, logins, online_time, record=record, intervals=intervals, daily=daily, sketches=sketches, patterns=patterns))
+             for name, filenames in servers]
+  if states:
+    for (name, aggregator), state in zip(results, states):
+      if state is not None:
+        aggregator.set_state(state)
+  if not cache and jobs <= 1:
+    for (name, filenames), (name, aggregator) in zip(servers, results):
+      for filename, file_date, lines in stream_logfiles(filenames, threads):
+        aggregator.feed_lines(file_date, lines)
+    record_event_counts(results)
+    return results
+  deathlist = read_deathlist()
+  if cache:
+    stats_cache = StatsCache(cache, deathlist, record, intervals, daily, sketches, patterns)
+    # all statistics are calculated, s.t. the cache can be used for any of them later on
+    chat = deaths = logins = online_time = True
+  else:
+    stats_cache = None
+  # the lines are not read yet, no logfile has been opened so far
+  logfiles = []
+  for (name, filenames), (name, aggregator) in zip(servers, results):
+    logfiles.extend((filename, file_date, aggregator) for filename, file_date, lines in stream_logfiles(filenames))
+  cached = {}
+  if stats_cache:
+    for index, (filename, file_date, aggregator) in enumerate(logfiles):
+      if file_date:
+        stats = stats_cache.get(filename)
+        if stats:
+          if verbose:
+            print 'using cached statistics for', filename
+          cached[index] = stats
+  jobs_list = [(filename, file_date, chat, deaths, logins, online_time, deathlist, record, intervals, daily, sketches, patterns)
+               for index, (filename, file_date, aggregator) in enumerate(logfiles) if index not in cached]
+  pool = None
+  if jobs > 1 and jobs_list:
+    pool = multiprocessing.Pool(jobs)
+    # imap gives the results in the order of jobs_list
+    scanned = pool.imap(scan_logfile_job, jobs_list)
+  else:
+    scanned = itertools.imap(scan_logfile_job, jobs_list)
+  for index, (filename, file_date, aggregator) in enumerate(logfiles):
+    if index in cached:
+      stats = cached.pop(index)
+    else:
+      stats = scanned.next()
+      if stats_cache and file_date:
+        stats_cache.put(filename, stats)
+    aggregator.merge_file(stats)
+  if pool:
+    pool.close()
+    pool.join()
+  if stats_cache:
+    stats_cache.close()
+  record_event_counts(results)
+  return results
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def record_event_counts(servers):
+  """
+  record_event_counts adds the number of lines found for each event by tokenize_line to timing (see Timing.count), as the stage tokenize_line.
+  servers - a list of (name, Aggregator) as given by process_servers
+  """
+  for name, aggregator in servers:
+    for event, number in enumerate(aggregator.event_counts):
+      if number:
+        timing.count('tokenize_line', Event.names[event], number)
+  return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def merge_servers(servers, include_online=False):
+  """
+  merge_servers gives the statistics of the whole network, i.e. of all users on all servers.
+  servers - a list of (name, Aggregator) as given by process_servers
+  include_online - as for Aggregator.add_server
+  Returns a new Aggregator.
+  """
+  first = servers[0][1]
+  network = Aggregator(first.count_chat, first.count_deaths, first.count_logins, first.count_online_time,
+                       intervals=first.intervals is not None, daily=first.daily is not None, sketches=first.sketches is not None)
+  for name, aggregator in servers:
+    network.add_server(aggregator, include_online)
+  return network
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def concurrency(starts, ends, bucket=3600):
+  """
+  concurrency gives the number of intervals which are open at the same time. The starts and ends are sorted once and swept in order, counting +1 at each start and -1 at each end, so this takes O(n log n) for n intervals plus one step per bucket with an open interval. At the same time, ends are counted before starts, s.t. a user logging in again in the second they left is not counted twice.
+  starts, ends - the starts and ends of the intervals in seconds since 1970-01-01, as in Intervals
+  bucket - the length of the buckets in seconds, by default hours
+  Returns a tuple of dictionaries {start of bucket: value}, only for buckets with an open interval: the highest number of open intervals, the sum of the seconds of the open intervals (i.e. player seconds) and the number of seconds with at least one open interval.
+  """
+  points = sorted(itertools.chain(((end, -1) for end in ends), ((start, 1) for start in starts)))
+  peaks = {}
+  seconds = {}
+  covered = {}
+  count = 0
+  for index in xrange(len(points) - 1):
+    time, change = points[index]
+    count += change
+    if count <= 0:
+      continue
+    end = points[index + 1][0]
+    while time < end:
+      start = time - time % bucket
+      until = min(end, start + bucket)
+      if count > peaks.get(start, 0):
+        peaks[start] = count
+      seconds[start] = seconds.get(start, 0) + count * (until - time)
+      covered[start] = covered.get(start, 0) + until - time
+      time = until
+  return peaks, seconds, covered
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class LogFollower:
+  """
+  The LogFollower class reads the lines which are added to a growing logfile (i.e. latest.log) and feeds them into an Aggregator. Each call of poll only reads the new lines. When the server rotates the logfile on a restart (latest.log becomes YYYY-MM-DD-N.log.gz), the rest of the old file is read and the new latest.log is followed from its beginning.
+  """
+  def __init__(self, filename, aggregator):
+    self.filename = filename
+    self.aggregator = aggregator
+    # the open logfile and its inode, to notice when it is rotated
+    self.logfile = None
+    self.inode = None
+    # the last line, as long as it is not complete
+    self.rest = ''
+
+  def open(self):
+    """
+    open opens the logfile, if it exists. Returns True, if it has been opened.
+    """
+    try:
+      # io.open does not use stdio, which would not read anymore once it has seen the end of the file
+      self.logfile = io.open(self.filename, 'rb')
+    except IOError:
+      return False
+    self.inode = os.fstat(self.logfile.fileno()).st_ino
+    self.rest = ''
+    self.aggregator.start_file(logfile_date(self.filename))
+    if verbose:
+      print 'following', self.filename
+    return True
+
+  def poll(self):
+    """
+    poll reads the lines which have been added to the logfile since the last call and feeds them into the Aggregator.
+    Returns the number of new lines.
+    """
+    if not self.logfile and not self.open():
+      return 0
+    count = self.read()
+    try:
+      stat = os.stat(self.filename)
+    except OSError:
+      # the logfile is being rotated, try again next time
+      return count
+    if stat.st_ino != self.inode or stat.st_size < self.logfile.tell():
+      # the logfile has been rotated, read what is left of the old one and start with the new one
+      count += self.read()
+      if self.rest:
+        count += self.feed([self.rest])
+      self.logfile.close()
+      self.logfile = None
+      if self.open():
+        count += self.read()
+    return count
+
+  def read(self):
+    """
+    read feeds all complete lines, which can be read from the logfile at the moment. Returns the number of lines.
+    """
+    data = self.logfile.read()
+    if not data:
+      return 0
+    lines = (self.rest + data).split('\n')
+    # the last line is not complete yet (or empty)
+    self.rest = lines.pop()
+    return self.feed([line.rstrip('\r') for line in lines])
+
+  def feed(self, lines):
+    """
+    feed hands lines to the Aggregator. Returns the number of lines.
+    """
+    for line in lines:
+      self.aggregator.feed_line(line, tokenize_line(line, self.aggregator.matcher))
+    return len(lines)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def follow_logfile(filename, aggregator, interval, update):
   """
-  purge_chat will split the logfiles into one file containing everything but chat/emotes and one file containing only chat/emotes.
-  raw_data - a list of logfiles, each logfile is a string containing the whole file
+  follow_logfile keeps feeding the lines which are added to filename into aggregator and calls update, when there have been new lines. It only returns on KeyboardInterrupt.
+  filename - the growing logfile, i.e. latest.log
+  aggregator - an Aggregator, usually it already contains the statistics of the older logfiles
+  interval - update is called at most once in this many seconds
+  update - a function without arguments, which e.g. writes the output
   """
-  chatless = []
-  chatfull = []
-  for logfile in raw_data:
-    chatlines = []
-    loglines = []
-    # logfile is the content of a single log file
-    lines = logfile.split('\n')
-    for line in lines:
-      # search for chat and emotes
-      chat = re.search(Regex.chat, line)
-      emote = re.search(Regex.emote, line)
-      # the line is either a chat/emote line, or not, put it into the according structure
-      if chat or emote:
-        chatlines.append(line)
-      else:
-        loglines.append(line)
-    loglines = '\n'.join(loglines)
-    chatlines = '\n'.join(chatlines)
-    chatless.append(loglines)
-    chatfull.append(chatlines)
-  return chatless, chatfull
+  follower = LogFollower(filename, aggregator)
+  changed = True
+  last_update = 0
+  while True:
+    if follower.poll():
+      changed = True
+    if changed and time.time() - last_update >= interval:
+      update()
+      changed = False
+      last_update = time.time()
+    time.sleep(min(1, interval))
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_online_time(raw_data):
   """
   Given a list of the content of valid minecraft logfiles, process_online_time will calculate the online time for each player.
   raw_data - a list of logfiles, each logfile is a string containing the whole file
   """
-  online_time = {}
-  online = {}
-  last_time = None
-  for logfile in raw_data:
-    # logfile is the content of a single log file
-    lines = logfile.split('\n')
-    # extract date from file
-    file_date = re.search(Regex.file_date, lines[0])
-    if file_date:
-      file_date = file_date.group()
-    else:
-      # if the regex is not found in the first line, it is assumed to be latest.log or test.log
-      if verbose:
-        print 'assuming the filename is latest or test:', lines[0]
-      #file_date = 'date', datetime.datetime.now().date()
-      file_date = datetime.datetime.now().date()
-    # check if the server did a clean shutdown (i.e. there are no users still online when the server starts)
-    for line in lines[1:10]:
-      search_result = re.search(Regex.login, line)
-      if search_result:
-        # this is a fresh server log, no users should be online
-        if online:
-          # there are sill users online, logging them out at the last point, where the server was known to run
-          if verbose:
-            print 'unclean shutdown, parting users at last known time the server was running'
-          online_list = []
-          for user in online:
-            online_list.append(user)
-          for user in online:
-            from_time = online[user]
-            if user in online_list:
-              online_time[user] += last_time - from_time
-            else:
-              online_time[user] = last_time - from_time
-          for user in online_list:
-            del online[user]
-    # lines is a list of all lines from the logfile
-    if not re.search(Regex.time,lines[0]):
-      # first line may contain date inserted by this script, ignore this
-      del lines[0]
-    for line in lines:
-      if line == '':
-        continue
-      search_date = re.search(Regex.time, line)
-      if not search_date:
-        sys.stderr.write(FontStyle.bold +
-                         'process_online_time:\n\t'
-                         + FontStyle.normal +
-                         'line contains no date:\n\t'
-                         + line + '\n')
-        continue
-      else:
-        #timestamp = file_date + ' ' + search_date.group(1)
-        time = datetime.datetime.strptime(str(file_date) + " " + search_date.group(1), '%Y-%m-%d %H:%M:%S')
-        # store time in case the server does an unclean shutdown (i.e. crash)
-        last_time = time
-      # search for login
-      search_result = re.search(Regex.login, line)
-      if search_result:
-        user = search_result.group(1)
-        # user logged in
-        if user in online:
-          # this should not happen
-          online[user] = time
-          sys.stderr.write(FontStyle.bold +
-                           'process_online_time:\n\t'
-                           + FontStyle.normal +
-                           'user logs in, although he is already online:\n\t'
-                           + line + '\n')
-        else:
-          # user is not online, comes online
-          online[user] = time
-      else:
-        # search for disconnects
-        for cur_reg in [Regex.logout, Regex.kick, Regex.con_lost]:
-          # looking for any of the part messages
-          search_result = re.search(cur_reg, line)
-          if search_result:
-            break  # we found a msg in this line
-        if search_result:
-          user = search_result.group(1)
-          # user has a part message
-          if user in online:
-            from_time = online[user]
-            del online[user]
-            # user was online, is now parting
-            if user in online_time:
-              # user has been online before
-              online_time[user] += time - from_time  # join-part
-            else:
-              # this was the first time, the user was online
-              online_time[user] = time - from_time  # join-part
-          else:
-            if verbose:
-              print 'redundant part message', line
-        else:
-          # we found no part message, look for server stop
-          search_result = re.search(Regex.stop, line)
-          if search_result:
-            user_list = []
-            for user in online:
-              from_time = online[user]
-              user_list.append(user)
-              if user in online_time:
-                online_time[user] += time - from_time
-              else:
-                online_time[user] = time - from_time
-            for user in user_list:
-              del online[user]
-          else:
-            if verbose:
-              print 'line contained no join/part/stop message\n\t', line
-
-  return online_time
+  return process_logs(raw_data, online_time=True).get_online_time()
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_logins(raw_data):
   """
-  Given a list of the content of valid minecraft logfiles, process_online_time will calculate the number of logins for this player.
+  Given a list of the content of valid minecraft logfiles, process_logins will calculate the number of logins for this player.
   raw_data - a list of logfiles, each logfile is a string containing the whole file
   """
-  # logins will be the dictionary which contains the number of logins for each player
-  logins = {}
-  # raw_data is a list of strings, each string is one logfile
-  for logfile in raw_data:
-    # split logfile into a list of lines
-    lines = logfile.split('\n')
-    for line in lines:
-      search_result = re.search(Regex.login, line)
-      if search_result:
-        search_result = search_result.group(1)
-        # now search result contains just the name of the user login in
-        if search_result in logins:
-          # user already in dictionary, increment
-          logins[search_result] += 1
-        else:
-          # user not yet in dictionary, insert
-          logins[search_result] = 1
-  return logins
+  return process_logs(raw_data, logins=True).get_logins()
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_deaths(raw_data):
   """
   Given a list of the content of valid minecraft logfiles, process_deaths will calculate the number of deaths for each player.
   raw_data - a list of logfiles, each logfile is a string containing the whole file
   """
-  # deaths will be the dictionary which contains the number of deaths
-  deaths = {}
-  # read list of possible death causes
-  deathlist_file = open(os.path.join(sys.path[0], 'deathlist'), 'r')
-  deathlist = deathlist_file.read().split('\n')
-  deathlist_file.close()
-  # raw_data is a list of strings, each string is one logfile
-  for logfile in raw_data:
-    # split logfile into a list of lines
-    lines = logfile.split('\n')
-    #don't need first line, as this will only contain the death
-    for line in lines:
-      death_found = False
-      # lines may contain empty strings
-      for deathline in deathlist:
-        if not deathline:
-          continue
-        if deathline in line:
-          # we have found a line where a death has taken place
-          death_found = True
-          break
-      if death_found:
-        # extract name of user
-        search_result = re.search(Regex.name, line)
-        if search_result:
-          user = search_result.group(1)
-          if '*' in user:
-            print lines[0]
-            print line
-          if user in deaths:
-            # user has already died once
-            deaths[user] += 1
-          else:
-            # user never died before
-            deaths[user] = 1
-        else:
-          sys.stderr.write(FontStyle.bold +
-                           'process_deaths:\n\t'
-                           + FontStyle.normal +
-                           'found a line with a death, but no username:\n\t'
-                           + line + '\n')
-  return deaths
-
+  return process_logs(raw_data, deaths=True).get_deaths()
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_chats(raw_data):
   """
   Given a list of the content of valid minecraft logfiles, process_chats will calculate the number of times each player used the chat or emotes.
   raw_data - a list of logfiles, each logfile is a string containing the whole file
   """
-  # chats will be the dictionary which contains the numer of chats/emotes for each player
-  chats = {}
-  # raw_data is a list of strings, each string is one logfile
-  for logfile in raw_data:
-    # split logfile into a list of lines
-    lines = logfile.split('\n')
-    for line in lines:
-      # look if this line contains chat
-      if line == '':
-        # this may happen sometimes
-        continue
-      search_result = re.search(Regex.chat, line)
-      if not search_result:
-        # if not, this line should contain an emote
-        search_result = re.search(Regex.emote, line)
-        if not search_result:
-          # this should not happen
-          sys.stderr.write('chat-line processed, but neither chat nor emote found\n')
-          sys.stderr.write(FontStyle.bold +
-                           'process_chats:\n\t'
-                           + FontStyle.normal +
-                           'chat-line-processed, but neither chat nor emote found:\n\t'
-                           + line + '\n')
-          # skip this line
-          continue
-      # we have either a chat or an emote
-      user = search_result.group(1)
-      if user in chats:
-        # user has already chatted once
-        chats[user] += 1
-      else:
-        chats[user] = 1
-  return chats
+  return process_logs(raw_data, chat=True).get_chats()
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_by_login(data_dictionary, login_dictionary):
   by_logins = {}
   for user in data_dictionary:
@@ -450,6 +2752,7 @@ def process_by_login(data_dictionary, login_dictionary):
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+@instrument
 def process_by_time(data_dictionary, online_dictionary):
   by_time = {}
   for user in data_dictionary:
@@ -463,80 +2766,212 @@ def process_by_time(data_dictionary, online_dictionary):
 
 def test_regexes():
   """
-  text_regexes is used to test the regexes used to find stuff in the logfiles. This is written for the included test.log but in theory should work on any valid logfile. For the test.log you should get output for every Regex.
+  test_regexes is used to test the header and the patterns of the events (see read_patterns) and the deathlist, as they are matched by tokenize_line. This is written for the included test.log, death.log and serverstart.log: for each event the number of lines found is checked and the first one is printed.
+  It gives True if all checks passed.
   """
+  patterns = read_patterns()
+  matcher = EventMatcher(patterns, read_deathlist())
   logfile = read_logfiles(['test.log'])[0].split('\n')
-  print 'testing chat regex'
-  for line in logfile:
-    user = re.search(Regex.chat, line)
-    if user:
-      print '\tchat', user.group(1) + '\n\t' + line
-  print 'testing emote regex'
-  for line in logfile:
-    user = re.search(Regex.emote, line)
-    if user:
-      print '\temote', user.group(1) + '\n\t' + line
-  print 'testing time regex'
+  print 'testing header (should be True for each line)'
   for line in logfile:
-    time = re.search(Regex.time, line)
-    if time:
-      print '\ttime:', time.group(1) + '\n\t' + line
+    seconds = matcher.line_seconds(line)
+    if seconds is not None:
+      print '\ttime: %02d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60) + '\n\t\t' + line
       break
-  print 'testing login regex'
-  for line in logfile:
-    user = re.search(Regex.login, line)
-    if user:
-      print '\tlogin:', user.group(1) + '\n\t' + line
+  passed = seconds is not None
+  # the vanilla header matched as a regex instead of at its fixed positions has to give the same
+  regex_matcher = EventMatcher([(event, '(?:)' + pattern if event is None else pattern) for event, pattern in patterns], read_deathlist())
+  correct = all(tokenize_line(line, regex_matcher) == tokenize_line(line, matcher) and
+                regex_matcher.line_seconds(line) == matcher.line_seconds(line) for line in logfile if line)
+  passed = passed and correct
+  print '\tvanilla header as regex:', correct
+  # the header of servers before 1.7, with the date in each line
+  old_matcher = EventMatcher([(None, r'\d{4}-\d{2}-\d{2} (?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2}) \[INFO\] ')] + patterns[1:], [])
+  line = '2013-05-01 10:42:23 [INFO] <alice> anyone got iron?'
+  correct = (old_matcher.line_seconds(line) == 38543 and
+             tokenize_line(line, old_matcher) == (Event.chat, 'alice', None, 'anyone got iron?'))
+  passed = passed and correct
+  print '\tconfigured header:', correct
+  # the number of lines of each event in the sample logfiles
+  expected = (('test.log', {Event.login: 4, Event.logout: 2, Event.kick: 1, Event.con_lost: 2, Event.chat: 1, Event.emote: 1,
+                            Event.death: 3, Event.start: 2, Event.stop: 2}),
+              ('death.log', {Event.death: 46}),
+              ('serverstart.log', {Event.start: 5}))
+  for filename, numbers in expected:
+    print 'testing patterns on', filename, '(should be True for each event)'
+    found = {}
+    for line in read_logfiles([filename])[0].split('\n'):
+      token = tokenize_line(line, matcher)
+      if token:
+        found.setdefault(token[0], []).append((token, line))
+    for event, name in enumerate(Event.names):
+      if event in numbers or event in found:
+        lines = found.get(event, [])
+        correct = len(lines) == numbers.get(event, 0)
+        passed = passed and correct
+        print '\t%s: %s' % (name, correct)
+        if lines:
+          (event, user, cause, message), line = lines[0]
+          if user is not None:
+            print '\t\t' + ', '.join(value for value in (user, cause, message) if value is not None)
+          print '\t\t' + line
+  return passed
 
-      break
-  print 'testing logout regex'
-  for line in logfile:
-    user = re.search(Regex.logout, line)
-    if user:
-      print '\tlogout:', user.group(1) + '\n\t' + line
 
-      break
-  print 'testing kick regex'
-  for line in logfile:
-    user = re.search(Regex.kick, line)
-    if user:
-      print '\tkick:', user.group(1) + '\n\t' + line
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
-      break
-  print 'testing connection lost regex'
-  for line in logfile:
-    user = re.search(Regex.con_lost, line)
-    if user:
-      print '\tlost connection:', user.group(1) + '\n\t' + line
+def test_sessions():
+  """
+  test_sessions checks the online time of synthetic logfiles with crashes, restarts and rotations. Each case is read one logfile after another and also scanned separately and merged (as with --jobs), both should give the expected online time.
+  It gives True if all cases passed.
+  """
+  passed = True
+  line = lambda time, message: '[%s] [Server thread/INFO]: %s' % (time, message)
+  start = lambda time: [line(time, 'Starting minecraft server version 1.7.2'), line(time, 'Starting Minecraft server on 127.0.0.1:25565')]
+  # each case is (name, [(file date, lines)], {user: expected online seconds})
+  cases = [('crash between logfiles',
+            [('2014-03-01', start('10:00:00') + [line('10:00:05', 'alice joined the game'), line('10:30:00', '<alice> hi')]),
+             ('2014-03-01', start('11:00:00') + [line('11:05:00', 'alice joined the game'), line('11:10:00', 'alice left the game'),
+                                                  line('11:20:00', 'Stopping the server')])],
+            {'alice': 1795 + 300}),
+           ('crash without logins after the restart',
+            [('2014-03-01', start('10:00:00') + [line('10:00:05', 'alice joined the game'), line('10:30:00', '<alice> hi')]),
+             ('2014-03-01', start('11:00:00') + [line('11:10:00', 'Stopping the server')])],
+            {'alice': 1795}),
+           ('crash within a logfile',
+            [('2014-03-01', start('10:00:00') + [line('10:00:05', 'alice joined the game'), line('10:30:00', '<alice> hi')]
+              + start('11:00:00') + [line('11:01:00', 'bob joined the game'), line('11:31:00', 'Stopping the server')])],
+            {'alice': 1795, 'bob': 1800}),
+           ('rotation without restart',
+            [('2014-03-01', start('23:00:00') + [line('23:00:05', 'alice joined the game')]),
+             ('2014-03-02', [line('00:00:10', 'bob joined the game'), line('00:10:00', '<alice> hi'), line('00:30:05', 'alice left the game'),
+                             line('00:40:10', 'bob left the game'), line('00:50:00', 'Stopping the server')])],
+            {'alice': 5400, 'bob': 2400})]
+  print 'testing crash stitching (should be True for each line)'
+  for name, logfiles, expected in cases:
+    serial = Aggregator(online_time=True)
+    for file_date, lines in logfiles:
+      serial.feed_lines(file_date, lines)
+    merged = Aggregator(online_time=True)
+    for file_date, lines in logfiles:
+      merged.merge_file(scan_logfile(file_date, lines, False, False, False, True))
+    for mode, aggregator in (('read', serial), ('merged', merged)):
+      correct = aggregator.by_name(aggregator.online_seconds, lambda value: value >= 0) == expected
+      passed = passed and correct
+      print '\t%s, %s:' % (name, mode), correct
+  return passed
+
+
+def test_store():
+  """
+  test_store checks that logfiles added to an EventStore one at a time (see --store) give the same statistics as all of them read at once, also for the sessions still open at the end of a run. The online time, the sessions and runs of the server (see Intervals) the activity of each day (see DailyRollup) and the sketches of each day (see Sketches) are compared. The logfiles are written into a temporary directory, each one is added once read one after another and once scanned and merged (with a cache).
+  It gives True if all cases passed.
+  """
+  passed = True
+  line = lambda time, message: '[%s] [Server thread/INFO]: %s' % (time, message)
+  start = lambda time: [line(time, 'Starting minecraft server version 1.7.2'), line(time, 'Starting Minecraft server on 127.0.0.1:25565')]
+  # alice is online when the server crashes at the end of the first logfile, she is parted by the start in the second one
+  logfiles = [('2014-03-01-1.log', start('10:00:00') + [line('10:00:05', 'alice joined the game'), line('10:30:00', '<alice> hi')]),
+              ('2014-03-01-2.log', start('11:00:00') + [line('11:01:00', 'bob joined the game'), line('11:31:00', 'Stopping the server')])]
+  def intervals(results):
+    # the sessions by the names of the users and the runs, in any order
+    intervals = results.get_intervals()
+    return (sorted(itertools.izip([results.users.names[user] for user in intervals.session_users], intervals.session_starts, intervals.session_ends)),
+            sorted(itertools.izip(intervals.run_starts, intervals.run_ends)))
+  def rollup(results):
+    # the values of each day and the first and last time seen, by the names of the users
+    daily = results.get_daily()
+    names = results.users.names
+    return (sorted((names[user], day, list(values)) for (user, day), values in daily.days.iteritems()),
+            sorted((names[user], time) for user, time in daily.first_seen.iteritems()),
+            sorted((names[user], time) for user, time in daily.last_seen.iteritems()))
+  def sketched(results):
+    # the registers of the users online and the buckets of the session lengths of each day
+    sketches = results.get_sketches()
+    return (sorted((day, str(users.registers)) for day, users in sketches.users.iteritems()),
+            sorted((day, sorted(lengths.buckets.items()), lengths.zeros, lengths.total) for day, lengths in sketches.sessions.iteritems()))
+  directory = tempfile.mkdtemp()
+  print 'testing logfiles added to a store one at a time (should be True for each line)'
+  try:
+    filenames = []
+    for name, lines in logfiles:
+      filenames.append(os.path.join(directory, name))
+      logfile = open(filenames[-1], 'w')
+      logfile.write('\n'.join(lines) + '\n')
+      logfile.close()
+    fresh = process_logfiles(filenames, online_time=True, intervals=True, daily=True, sketches=True)
+    expected = fresh.by_name(fresh.online_seconds, lambda value: value >= 0)
+    for mode, cache in (('read', None), ('merged', os.path.join(directory, 'cache'))):
+      store_directory = os.path.join(directory, 'store-' + mode)
+      for filename in filenames:
+        store, new_files = open_event_store(store_directory, [filename])
+        add_to_event_store(store, process_logfiles(new_files, cache=cache, record=True, state=store.state), new_files)
+        store.save(store_directory)
+      results = load_event_store(store_directory).query(intervals=True, daily=True, sketches=True)
+      correct = results.by_name(results.online_seconds, lambda value: value >= 0) == expected == {'alice': 1795, 'bob': 1800}
+      passed = passed and correct
+      print '\tonline time, %s:' % mode, correct
+      correct = intervals(results) == intervals(fresh)
+      passed = passed and correct
+      print '\tintervals, %s:' % mode, correct
+      correct = rollup(results) == rollup(fresh)
+      passed = passed and correct
+      print '\tdaily, %s:' % mode, correct
+      correct = sketched(results) == sketched(fresh)
+      passed = passed and correct
+      print '\tsketches, %s:' % mode, correct
+  finally:
+    shutil.rmtree(directory)
+  return passed
 
-      break
-  print 'testing name regex'
-  for line in logfile:
-    user = re.search(Regex.name, line)
-    if user:
-      print '\tname', user.group(1)
-      break
-  print 'testing serverstop regex (should be two results)'
-  for line in logfile:
-    serverstop = re.search(Regex.stop, line)
-    if serverstop:
-      print '\tserverstop:', True
-  print 'testing serverstart regex (should be five results)'
-  logfile = read_logfiles(['serverstart.log'])[0].split('\n')
-  for line in logfile:
-    serverstart = re.search(Regex.start, line)
-    if serverstart:
-      print'\tserverstart:', True
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def top_entries(dictionary, top=None, sorted_by_value=True):
+  """
+  top_entries gives the keys of dictionary in the order they are shown, by value with the highest value first or alphabetically.
+  top - if given, only the first top keys are given. These are selected with a heap in O(n log top), instead of sorting all keys.
+  """
+  if not sorted_by_value:
+    if top is None:
+      return sorted(dictionary)
+    return heapq.nsmallest(top, dictionary)
+  if top is None:
+    return sorted(dictionary, key=dictionary.__getitem__, reverse=True)
+  return heapq.nlargest(top, dictionary, key=dictionary.__getitem__)
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def json_pages(title, description, dictionary, page_size=None, sorted_by_value=True):
+  """
+  json_pages gives the entries of dictionary as json, split into pages of page_size entries. Each page is {"title", "description", "page", "pages", "values": [[user, value], ...]}, the values are a list s.t. they keep their order. Times are given in seconds.
+  page_size - the number of entries per page, a single page if not given
+  sorted_by_value - as for top_entries, the highest value first or (i.e. for the days of a series) ordered by key
+  """
+  values = dict(dictionary)
+  for user in values:
+    if isinstance(values[user], datetime.timedelta):
+      values[user] = values[user].total_seconds()
+  keys = top_entries(values, sorted_by_value=sorted_by_value)
+  if page_size is None:
+    keys = [keys]
+  else:
+    keys = [keys[index:index + page_size] for index in xrange(0, len(keys), page_size)] or [[]]
+  return [json.dumps({'title': title, 'description': description, 'page': page + 1, 'pages': len(keys),
+                      'values': [[user, values[user]] for user in keys[page]]})
+          for page in xrange(len(keys))]
 
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
-def print_dict(dictionary, heading=None, description=None, sorted_by_value=True):
+def print_dict(dictionary, heading=None, description=None, sorted_by_value=True, top=None):
   """
   print_dict prints a dictionary in a nicely readable manner. string will be printed as a header, if given. The sort_list can be used to sort the dictionary differently. By default it will be sorted naturally after the key. This can be used to sort by the value or similar.
   dictionary - a python dictionary containing some printable stuff
   string - print something in front of the output, if nothing is supplied 'Output:' will be used
   sorted_by_value - When this is True, the printout will be sorted by the value with the highest value first. Otherwise it will be sorted alphabetically.
+  top - if given, only the first top entries are printed
   """
   if heading:
     # print something before the dictionary
@@ -544,15 +2979,14 @@ def print_dict(dictionary, heading=None, description=None, sorted_by_value=True)
   else:
     # just print the default
     print FontStyle.bold + 'Output:' + FontStyle.normal
-  if sorted_by_value:
-    sort_list = sorted(dictionary, key=lambda x: dictionary[x], reverse=True)
-  else:
-    sort_list = sorted(dictionary)
+  sort_list = top_entries(dictionary, top, sorted_by_value)
   if description:
     print '\t' + description
   for name in sort_list:
     # print each entry from the sorted_list
     print '\t', name + ':', dictionary[name]
+  if len(sort_list) < len(dictionary):
+    print '\t...', len(dictionary) - len(sort_list), 'more'
   return
 
 
@@ -573,12 +3007,31 @@ def print_dict_html(dictionary, description=None, heading=None, sorted_by_value=
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
+def print_chat(messages):
+  """
+  print_chat prints chat messages as found by ChatIndex.search, one per line with their time and user, like in the logs: '<user> message' for chat and '* user message' for emotes.
+  messages - a list of (time, user, event, message)
+  """
+  for seconds, user, event, message in messages:
+    if event == Event.emote:
+      user = '* ' + user
+    else:
+      user = '<' + user + '>'
+    print datetime.datetime.utcfromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S'), user, message
+  if verbose:
+    print len(messages), 'messages found'
+  return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
 def print_help():
   """
   print_help will display usage instructions for mcStats. It will stop the program after printing.
   """
   print 'Minecraft Statistics - Usage'
-  print FontStyle.bold + 'mcStats' + FontStyle.normal, '[--help] [--write outputfile] [--online-time] [--logins] [--deaths] [--verbose]', FontStyle.bold + 'file [file ...]' + FontStyle.normal
+  print FontStyle.bold + 'mcStats' + FontStyle.normal, '[--help] [--write outputfile] [--online-time] [--logins] [--deaths] [--cache cachefile] [--jobs N] [--follow logfile [--interval seconds]] [--store directory [--since date] [--until date] [--search words] [--player name]] [--threads N] [--timing] [--serve port] [--top N] [--concurrency] [--daily] [--sketches] [--patterns patternfile] [--server name=logs ...] [--profile outputfile] [--cprofile dumpfile] [--verbose]', FontStyle.bold + 'file|directory|pattern [...]' + FontStyle.normal
+  print '\tLogfiles can be given as files, directories (all .log and .log.gz files in it) or quoted patterns like \'logs/2014-03-*\'. The logfiles of directories and patterns are sorted by the date and number in their names, latest.log comes last.'
   print FontStyle.bold + '\t--help' + FontStyle.normal
   print '\t\tPrint the help text. If this option is given, all other options will be ignored.'
   print FontStyle.bold + '\t--write outputfile' + FontStyle.normal
@@ -590,11 +3043,51 @@ def print_help():
   print FontStyle.bold + '\t--logins' + FontStyle.normal
   print '\t\tGive the number of times each player has logged in.'
   print FontStyle.bold + '\t--deaths' + FontStyle.normal
-  print '\t\tGive the number of deaths for each player.'
+  print '\t\tGive the number of deaths for each player and for each cause of death.'
   print FontStyle.bold + '\t--by-login' + FontStyle.normal
   print '\t\tCalculate values for the other flags by login.'
   print FontStyle.bold + '\t--by-time' + FontStyle.normal
   print '\t\tCalculate values for the other flags by online time.'
+  print FontStyle.bold + '\t--cache cachefile' + FontStyle.normal
+  print '\t\tKeep the statistics of each logfile in cachefile. Logfiles which have not changed since the last run are not read again.'
+  print FontStyle.bold + '\t--jobs N' + FontStyle.normal
+  print '\t\tRead the logfiles with N processes in parallel. The results are the same as with a single process.'
+  print FontStyle.bold + '\t--follow logfile' + FontStyle.normal
+  print '\t\tAfter reading the given files, keep reading the lines added to logfile (i.e. latest.log), also after the server rotated it. The output is updated when there are new lines.'
+  print FontStyle.bold + '\t--interval seconds' + FontStyle.normal
+  print '\t\tUpdate the output of --follow at most every this many seconds, default is 10.'
+  print FontStyle.bold + '\t--store directory' + FontStyle.normal
+  print '\t\tKeep all events of the given files in directory, as compact columns. Files which are in the store already are not added again, logfiles without a date (i.e. latest.log) are not added at all. The statistics are calculated from all events kept there.'
+  print FontStyle.bold + '\t--since date' + FontStyle.normal
+  print '\t\tOnly count the events from date (YYYY-MM-DD or \'YYYY-MM-DD HH:MM:SS\') on, needs --store.'
+  print FontStyle.bold + '\t--until date' + FontStyle.normal
+  print '\t\tOnly count the events up to date (YYYY-MM-DD, including this day, or \'YYYY-MM-DD HH:MM:SS\'), needs --store.'
+  print FontStyle.bold + '\t--search words' + FontStyle.normal
+  print '\t\tPrint the chat messages containing all words instead of the statistics, from the index kept by --store. The given files are added to the store first. Can be combined with --player, --since and --until.'
+  print FontStyle.bold + '\t--player name' + FontStyle.normal
+  print '\t\tPrint the chat messages of the user name, like --search.'
+  print FontStyle.bold + '\t--threads N' + FontStyle.normal
+  print '\t\tDecompress up to N upcoming .gz logfiles in background threads, while the current one is read. These are kept in memory. Not used with --cache or --jobs.'
+  print FontStyle.bold + '\t--timing' + FontStyle.normal
+  print '\t\tPrint the time spent decompressing and parsing the logfiles and rendering the html output. With --jobs, the time spent in the other processes is included in parse.'
+  print FontStyle.bold + '\t--serve port' + FontStyle.normal
+  print '\t\tServe the statistics over http on port instead of printing them: the html output at /, each statistic as json at /<name>.json, /sections.json lists the names. With --follow, the pages are updated with the logfile.'
+  print FontStyle.bold + '\t--top N' + FontStyle.normal
+  print '\t\tOnly show the N users with the highest values of each statistic. With --write, all users are written next to outputfile as json, in pages of N users. With --serve, page k of a statistic is at /<name>/<k>.json.'
+  print FontStyle.bold + '\t--concurrency' + FontStyle.normal
+  print '\t\tKeep the sessions of the users and the runs of the server (from start to stop or crash) as intervals. Give the highest number of users online at the same time by hour and day, the average number by hour of the day and the uptime of the server. Includes --online-time. With --store they are calculated from the stored sessions and runs.'
+  print FontStyle.bold + '\t--daily' + FontStyle.normal
+  print '\t\tKeep the online time, logins, deaths and chat messages of each user on each day. Give the first and last time each user was seen, the part of the time since then they were online and the totals of each day (or month), which are shown as charts with --write. The table of each user and day is written next to outputfile as json (served at /daily.json with --serve). Includes --online-time. With --store they are calculated from the stored events and sessions.'
+  print FontStyle.bold + '\t--sketches' + FontStyle.normal
+  print '\t\tEstimate the number of different users online by day, week and month and the median, 95th and 99th percentile of the session length. The estimates need the same small memory for each day, no matter how many users and sessions there are, and are the same with --jobs and --cache. Includes --online-time. With --store they are calculated from the stored sessions.'
+  print FontStyle.bold + '\t--patterns patternfile' + FontStyle.normal
+  print '\t\tRead the patterns of the events from patternfile instead of the patterns file next to mcStats, e.g. for the messages of a modded server. Each line is an event (login, logout, kick, con_lost, chat, emote, death, start or stop) and a regex matched at the start of the message, with the named groups player, cause, target and message. All patterns and the deathlist are matched as a single regex, so more patterns do not mean more passes over the lines. The line \'header regex\' sets the header of the lines, with the time as the groups hour, minute and second, by default it is the one of the vanilla server ([HH:MM:SS] [Server thread/INFO]: ).'
+  print FontStyle.bold + '\t--server name=logs' + FontStyle.normal
+  print '\t\tRead the logs (file, directory or pattern) of the server name, may be given for several servers. The logfiles of each server are a timeline of their own. The statistics of the whole network come first, followed by the ones of each server. Can not be used with other logfiles, --follow or --store.'
+  print FontStyle.bold + '\t--profile outputfile' + FontStyle.normal
+  print '\t\tWrite wall time, cpu time, calls and the increase of the peak memory of each stage (reading, processing, rendering), the peak memory of the whole process, the lines and bytes read and the number of lines found for each event to outputfile as json. With --jobs, lines and bytes read by the other processes are not included.'
+  print FontStyle.bold + '\t--cprofile dumpfile' + FontStyle.normal
+  print '\t\tRun mcStats with cProfile and write the statistics to dumpfile, they can be read with pstats.'
   print FontStyle.bold + '\t--verbose' + FontStyle.normal
   print '\t\tPrint more stuff. Depending on the number of logfiles, this will be a mess. You have been warned.'
   print '\nAt the moment, the css for the outputfile will ' + FontStyle.underline + 'not' + FontStyle.normal + ' not be copied along, you have to do this manually.'
@@ -604,23 +3097,479 @@ def print_help():
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
-def dict_to_arr(result_dictionary, sorted_by_value=True):
+def print_timing(total):
+  """
+  print_timing prints the time spent decompressing and parsing the logfiles and rendering the html output to stderr.
+  total - the time spent in process_logfiles, in seconds
+  """
+  foreground = timing.get('decompress') + timing.get('wait for decompression')
+  sys.stderr.write(FontStyle.bold + 'Timing:\n' + FontStyle.normal)
+  sys.stderr.write('\tdecompress:                 %8.3fs\n' % timing.get('decompress'))
+  sys.stderr.write('\tdecompress (background):    %8.3fs\n' % timing.get('decompress (background)'))
+  sys.stderr.write('\twait for decompression:     %8.3fs\n' % timing.get('wait for decompression'))
+  sys.stderr.write('\tparse:                      %8.3fs\n' % (total - foreground))
+  sys.stderr.write('\trender:                     %8.3fs\n' % timing.get('render'))
+  return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def dict_to_arr(result_dictionary, sorted_by_value=True, top=None):
   res = []
-  for k,v in result_dictionary.items():
-    res.append({"name" : k, "value" : v})
-  if not sorted_by_value:
-    res = sorted(res)
-  else:
-    res = sorted(res, key=lambda k: k['value'], reverse=True)
+  for k in top_entries(result_dictionary, top, sorted_by_value):
+    res.append({"name" : k, "value" : result_dictionary[k]})
   return res
 
+# the parsed templates {filename: ParsedTemplate}, see load_template
+_templates = {}
+
+def load_template(filename):
+  """
+  load_template gives the parsed template filename (relative to mcStats), each template is read and parsed only once.
+  """
+  if filename not in _templates:
+    tplFile = open(os.path.join(sys.path[0], filename), "r")
+    _templates[filename] = pystache.parse(tplFile.read().decode('utf-8'))
+    tplFile.close()
+  return _templates[filename]
+
+@instrument
 def render_html(content):
-  tplFile = open(os.path.join(sys.path[0], layout_template),"r")
-  rendered = Renderer().render(tplFile.read(), content)
+  """
+  render_html renders the html output for content. The html of each section is rendered only once and kept in the section (see new_section and new_chart), so only changed sections are rendered again.
+  """
+  start = time.time()
+  renderer = Renderer()
+  rendered_sections = 0
+  for section in content["sections"]:
+    if "html" not in section:
+      section["html"] = renderer.render(load_template(section.get("template", section_template)), section)
+      rendered_sections += 1
+  rendered = renderer.render(load_template(layout_template), content)
+  timing.add('render', time.time() - start)
+  if verbose:
+    print 'rendered', rendered_sections, 'of', len(content["sections"]), 'sections in %.3fs' % (time.time() - start)
   return rendered
 
-def new_section(title, description, entries_dictionary):
-  return { "title": title, "description": description, "entries" : dict_to_arr(entries_dictionary) }
+# the last section created for each title, description and top {(title, description, top): (entries, section)}, see new_section
+_sections = {}
+
+def new_section(title, description, entries_dictionary, top=None):
+  """
+  new_section gives a section of the html output. If the entries have not changed since the last section with the same title and description, that section is given again, including its rendered html (see render_html).
+  top - if given, only the first top entries are shown
+  """
+  entries = frozenset(entries_dictionary.iteritems())
+  if (title, description, top) in _sections:
+    last_entries, section = _sections[(title, description, top)]
+    if last_entries == entries:
+      return section
+  section = { "title": title, "description": description, "entries" : dict_to_arr(entries_dictionary, top=top) }
+  # the number of entries which are not shown
+  section["more"] = len(entries_dictionary) - len(section["entries"])
+  _sections[(title, description, top)] = (entries, section)
+  return section
+
+def new_chart(title, description, series):
+  """
+  new_chart gives a section of the html output, which shows the values of series as bars in the order of their labels. Like new_section, an unchanged chart is given again.
+  series - the values to show {label: value}, i.e. as given by daily_series
+  """
+  entries = frozenset(series.iteritems())
+  if ('chart', title, description) in _sections:
+    last_entries, section = _sections[('chart', title, description)]
+    if last_entries == entries:
+      return section
+  highest = max(series.values() or [0]) or 1
+  bars = [{"label": label, "value": series[label], "percent": round(100.0 * series[label] / highest, 1)} for label in sorted(series)]
+  section = { "title": title, "description": description, "bars": bars, "template": chart_template }
+  _sections[('chart', title, description)] = (entries, section)
+  return section
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def concurrency_sections(results, include_online=False):
+  """
+  concurrency_sections gives the number of users online at the same time and the uptime of the server as a list of (name, title, description, values), like result_sections. Hours and days are given as 'YYYY-MM-DD HH:00' and 'YYYY-MM-DD'.
+  results - an Aggregator with Intervals, see process_logfiles
+  include_online - if True, the users which are online at the moment are counted until the last line
+  """
+  intervals = results.get_intervals(include_online)
+  label = lambda seconds, format: datetime.datetime.utcfromtimestamp(seconds).strftime(format)
+  peaks, seconds, covered = concurrency(intervals.session_starts, intervals.session_ends)
+  runs, run_seconds, uptime = concurrency(intervals.run_starts, intervals.run_ends, 86400)
+  peak_by_hour = {}
+  peak_by_day = {}
+  for hour in peaks:
+    peak_by_hour[label(hour, '%Y-%m-%d %H:00')] = peaks[hour]
+    day = label(hour, '%Y-%m-%d')
+    peak_by_day[day] = max(peak_by_day.get(day, 0), peaks[hour])
+  # the average over all days the server was running
+  by_hour_of_day = {}
+  for hour in seconds:
+    hour_of_day = label(hour, '%H:00')
+    by_hour_of_day[hour_of_day] = by_hour_of_day.get(hour_of_day, 0) + seconds[hour]
+  for hour_of_day in by_hour_of_day:
+    by_hour_of_day[hour_of_day] = round(by_hour_of_day[hour_of_day] / (3600.0 * max(len(uptime), 1)), 2)
+  uptime_by_day = dict((label(day, '%Y-%m-%d'), datetime.timedelta(seconds=uptime[day])) for day in uptime)
+  lengths = [end - start for start, end in itertools.izip(intervals.run_starts, intervals.run_ends)]
+  total = {}
+  if lengths:
+    total = {'total': datetime.timedelta(seconds=sum(uptime.values())),
+             'longest run': datetime.timedelta(seconds=max(lengths)),
+             'average run': datetime.timedelta(seconds=sum(lengths) // len(lengths))}
+  return [('peak-players-by-day', 'Peak Players by Day', 'Highest number of users online at the same time on each day.', peak_by_day),
+          ('peak-players-by-hour', 'Peak Players by Hour', 'Highest number of users online at the same time in each hour.', peak_by_hour),
+          ('players-by-hour-of-day', 'Players by Hour of Day', 'Average number of users online at each hour of the day.', by_hour_of_day),
+          ('uptime-by-day', 'Uptime by Day', 'Time the server was running on each day.', uptime_by_day),
+          ('uptime', 'Uptime', 'Time the server was running, from its start to its stop or crash.', total)]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def daily_sections(results, include_online=False):
+  """
+  daily_sections gives the first and last time each user was seen and the part of the time since then they were online as a list of (name, title, description, values), like result_sections.
+  results - an Aggregator with a DailyRollup, see process_logfiles
+  include_online - if True, the users which are online at the moment are counted until the last line
+  """
+  daily = results.get_daily(include_online)
+  label = lambda seconds: datetime.datetime.utcfromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S')
+  names = results.users.names
+  online_seconds = results.get_online_seconds(include_online)
+  online_share = {}
+  for user, first_seen in daily.first_seen.iteritems():
+    if results.last_time > first_seen and online_seconds[user] >= 0:
+      online_share[names[user]] = round(100.0 * online_seconds[user] / (results.last_time - first_seen), 1)
+  return [('first-seen', 'First Seen', 'Time each user was seen for the first time.',
+           dict((names[user], label(time)) for user, time in daily.first_seen.iteritems())),
+          ('last-seen', 'Last Seen', 'Time each user was seen for the last time.',
+           dict((names[user], label(time)) for user, time in daily.last_seen.iteritems())),
+          ('online-share', 'Online Share', 'Part of the time since each user was seen for the first time, which the user was online, in percent.', online_share)]
+
+
+def daily_series(daily):
+  """
+  daily_series gives the totals of all users on each day as series for charts, a list of (name, title, description, {day: value}) like result_sections. If the days span more than 100 days, the totals of each month are given instead.
+  daily - a DailyRollup, see Aggregator.get_daily
+  """
+  days = [day for user, day in daily.days]
+  bucket = '%Y-%m-%d'
+  if days and max(days) - min(days) > 100:
+    bucket = '%Y-%m'
+  labels = dict((day, datetime.date.fromordinal(_EPOCH + day).strftime(bucket)) for day in set(days))
+  active = {}
+  totals = [{} for column in DailyRollup.columns]
+  for (user, day), values in daily.days.iteritems():
+    label = labels[day]
+    active.setdefault(label, set()).add(user)
+    for column, value in enumerate(values):
+      totals[column][label] = totals[column].get(label, 0) + value
+  online_hours = dict((label, round(seconds / 3600.0, 1)) for label, seconds in totals[0].iteritems())
+  return [('active-users', 'Active Users', 'Number of different users seen.', dict((label, len(users)) for label, users in active.iteritems())),
+          ('online-hours', 'Online Hours', 'Hours all users were online together.', online_hours),
+          ('logins-by-day', 'Logins by Day', 'Number of logins of all users.', totals[1]),
+          ('deaths-by-day', 'Deaths by Day', 'Number of deaths of all users.', totals[2]),
+          ('chats-by-day', 'Chats by Day', 'Number of chat messages and emotes of all users.', totals[3])]
+
+
+def daily_table(results, include_online=False):
+  """
+  daily_table gives the activity of each user on each day as json: {"columns": [...], "users": {user: {"first_seen", "last_seen", "days": {'YYYY-MM-DD': [value of each column]}}}}, times are given as 'YYYY-MM-DD HH:MM:SS'.
+  results - an Aggregator with a DailyRollup, see process_logfiles
+  include_online - as for Aggregator.get_daily
+  """
+  daily = results.get_daily(include_online)
+  label = lambda seconds: datetime.datetime.utcfromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S')
+  users = {}
+  for user in daily.first_seen:
+    users[results.users.names[user]] = {"first_seen": label(daily.first_seen[user]), "last_seen": label(daily.last_seen[user]), "days": {}}
+  for (user, day), values in daily.days.iteritems():
+    name = results.users.names[user]
+    if name not in users:
+      # only online, i.e. the session was carried over from a logfile not read
+      users[name] = {"first_seen": None, "last_seen": label(daily.last_seen[user]), "days": {}}
+    users[name]["days"][datetime.date.fromordinal(_EPOCH + day).isoformat()] = list(values)
+  return json.dumps({"columns": DailyRollup.columns, "users": users})
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def sketch_sections(results, include_online=False):
+  """
+  sketch_sections gives the estimated number of different users online by day, week and month and the percentiles of the session length as a list of (name, title, description, values), like result_sections. Days are given as 'YYYY-MM-DD', weeks as 'YYYY-Www' (ISO weeks) and months as 'YYYY-MM'.
+  results - an Aggregator with Sketches, see process_logfiles
+  include_online - if True, the users which are online at the moment are counted until the last line
+  """
+  sketches = results.get_sketches(include_online)
+  periods = [{}, {}, {}]
+  for day in sketches.users:
+    date = datetime.date.fromordinal(_EPOCH + day)
+    year, week, weekday = date.isocalendar()
+    for period, label in zip(periods, (date.isoformat(), '%d-W%02d' % (year, week), date.strftime('%Y-%m'))):
+      period.setdefault(label, []).append(day)
+  by_day, by_week, by_month = [dict((label, sketches.count_users(days)) for label, days in period.iteritems()) for period in periods]
+  lengths = sketches.session_lengths()
+  percentiles = {}
+  if lengths.total:
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+      percentiles[name] = datetime.timedelta(seconds=int(round(lengths.quantile(fraction))))
+  return [('users-by-day', 'Users by Day', 'Estimated number of different users online on each day.', by_day),
+          ('users-by-week', 'Users by Week', 'Estimated number of different users online in each week.', by_week),
+          ('users-by-month', 'Users by Month', 'Estimated number of different users online in each month.', by_month),
+          ('session-length', 'Session Length', 'Estimated median, 95th and 99th percentile of the length of the sessions.', percentiles)]
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+def result_sections(results, chat, deaths, logins, online_time, by_logins, by_time, include_online=False, servers=None):
+  """
+  result_sections gives the requested statistics as a list of (name, title, description, {user: value}), in the order they are shown in the html output.
+  results - an Aggregator as given by process_logfiles
+  chat, deaths, logins, online_time, by_logins, by_time - the statistics to give, as given by the flags
+  include_online - if True, the users which are online at the moment are included in the online time
+  If results has Intervals (see --concurrency), the sections of concurrency_sections follow, if it has a DailyRollup (see --daily) the ones of daily_sections and if it has Sketches (see --sketches) the ones of sketch_sections.
+  servers - a list of (name, Aggregator) as given by process_servers, if given the statistics of each server follow the ones of results (i.e. of the whole network), named <server>.<name> and titled '<server>: <title>'
+  """
+  sections = []
+  if servers:
+    sections.extend(result_sections(results, chat, deaths, logins, online_time, by_logins, by_time, include_online))
+    for server, aggregator in servers:
+      for name, title, description, values in result_sections(aggregator, chat, deaths, logins, online_time, by_logins, by_time, include_online):
+        sections.append((server + '.' + name, server + ': ' + title, description, values))
+    return sections
+  if chat:
+    sections.append(('chat', 'Chat', 'Number of times each user used the chat.', results.get_chats()))
+  if deaths:
+    sections.append(('deaths', 'Deaths', 'Number of times each user died.', results.get_deaths()))
+    sections.append(('death-causes', 'Death Causes', 'Number of times each cause killed a user.', results.death_causes))
+  if logins:
+    sections.append(('logins', 'Logins', 'Number of times each user logged in.', results.get_logins()))
+  if online_time:
+    sections.append(('online-time', 'Online Time', 'Time each user was online.', results.get_online_time(include_online)))
+  if by_logins:
+    if chat:
+      sections.append(('chats-by-logins', 'Chats by Logins', 'Number of times each user used the chat by number of logins.',
+                       results.get_by_logins(results.chat_counts)))
+    if deaths:
+      sections.append(('deaths-by-logins', 'Deaths by Logins', 'Number of times each user died by number of logins.',
+                       results.get_by_logins(results.death_counts)))
+  if by_time:
+    if chat:
+      sections.append(('time-by-chat', 'Time by Chat', 'Time each user was online by chat message.',
+                       results.get_by_time(results.chat_counts, include_online)))
+    if deaths:
+      sections.append(('time-by-death', 'Time by Death', 'Time each user was online by Death.',
+                       results.get_by_time(results.death_counts, include_online)))
+    if logins:
+      sections.append(('time-by-login', 'Time by Login', 'Time each user was online by login.',
+                       results.get_by_time(results.login_counts, include_online)))
+  if results.intervals is not None:
+    sections.extend(concurrency_sections(results, include_online))
+  if results.daily is not None:
+    sections.extend(daily_sections(results, include_online))
+  if results.sketches is not None:
+    sections.extend(sketch_sections(results, include_online))
+  return sections
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+class StatsServer(BaseHTTPServer.HTTPServer):
+  """
+  The StatsServer class serves the statistics over http: the html output at / and each section of result_sections as json at /<name>.json (i.e. /chat.json, /online-time.json, see json_pages), /sections.json lists the names. With a DailyRollup, the series of daily_series are served the same way and the table of daily_table at /daily.json. If the sections are split into pages, /<name>.json is the first page and page k is at /<name>/<k>.json.
+  All pages are rendered once by publish, when the statistics have changed, and requests only send them. Each page has an ETag, s.t. clients polling with If-None-Match get a short 304 until there are new statistics.
+  """
+  def __init__(self, port):
+    BaseHTTPServer.HTTPServer.__init__(self, ('', port), StatsRequestHandler)
+    # the pages {path: (body, content type, etag)}, publish replaces the whole dictionary at once
+    self.pages = {}
+
+  def publish(self, results, chat, deaths, logins, online_time, by_logins, by_time, include_online=False, top=None, servers=None):
+    """
+    publish renders all pages for the given statistics, the arguments are the same as for result_sections.
+    top - if given, the html output only shows the first top entries of each section and the json is split into pages of top entries
+    """
+    pages = {}
+    sections = result_sections(results, chat, deaths, logins, online_time, by_logins, by_time, include_online, servers)
+    for name, title, description, values in sections:
+      for page, body in enumerate(json_pages(title, description, values, top)):
+        if page == 0:
+          pages['/' + name + '.json'] = body
+        pages['/%s/%d.json' % (name, page + 1)] = body
+    series = []
+    if results.daily is not None:
+      # the series are shown as charts, all of their values are on a single page
+      series = daily_series(results.get_daily(include_online))
+      for name, title, description, values in series:
+        pages['/' + name + '.json'] = pages['/%s/1.json' % name] = json_pages(title, description, values, sorted_by_value=False)[0]
+      pages['/daily.json'] = daily_table(results, include_online)
+    pages['/sections.json'] = json.dumps([name for name, title, description, values in sections + series])
+    content = {"title": _NAME, "generator": _NAME, "generated_at": datetime.datetime.now().ctime(),
+               "sections": [new_section(title, description, values, top) for name, title, description, values in sections]
+                           + [new_chart(title, description, values) for name, title, description, values in series]}
+    pages['/'] = render_html(content)
+    for path in pages:
+      content_type = 'application/json'
+      if path == '/':
+        content_type = 'text/html; charset=utf-8'
+      pages[path] = (pages[path], content_type, '"' + hashlib.md5(pages[path]).hexdigest() + '"')
+    self.pages = pages
+    return
+
+
+class StatsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """
+  The StatsRequestHandler class answers a single request to a StatsServer.
+  """
+  def do_GET(self):
+    self.send_page(True)
+    return
+
+  def do_HEAD(self):
+    self.send_page(False)
+    return
+
+  def send_page(self, with_body):
+    """
+    send_page answers the request with the page of the requested path, the body is only sent if with_body is True.
+    """
+    path = self.path.split('?', 1)[0]
+    if path == '/index.html':
+      path = '/'
+    pages = self.server.pages
+    if path not in pages:
+      self.send_error(404)
+      return
+    body, content_type, etag = pages[path]
+    if self.headers.get('If-None-Match') == etag:
+      # the client has this page already
+      self.send_response(304)
+      self.send_header('ETag', etag)
+      self.end_headers()
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('ETag', etag)
+    self.send_header('Cache-Control', 'no-cache')
+    self.end_headers()
+    if with_body:
+      self.wfile.write(body)
+    return
+
+  def log_message(self, format, *args):
+    # requests are only logged if verbose, the status codes of errors are still sent
+    if verbose:
+      BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+    return
+
+
+# >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
+
+@instrument
+def report(results, outname, chat, deaths, logins, online_time, by_logins, by_time, include_online=False, top=None, servers=None):
+  """
+  report prints the requested statistics or writes them to outname as html.
+  results - an Aggregator as given by process_logfiles
+  outname - the file to write the html output to, if empty the output is printed
+  chat, deaths, logins, online_time, by_logins, by_time - the statistics to report, as given by the flags
+  include_online - if True, the users which are online at the moment are included in the online time
+  top - if given, only the first top entries of each statistic are printed or shown in the html output. All entries are written next to outname as json, in pages of top entries (<outname>-<name>-<page>.json).
+  servers - a list of (name, Aggregator) as given by process_servers, the statistics of each server are reported after the ones of results (i.e. of the whole network)
+  With a DailyRollup (see --daily), the totals of each day are printed or shown as charts and the activity of each user on each day is written next to outname as json (<outname>-daily.json).
+  """
+  if chat:
+    chat_result = results.get_chats()
+    if not outname:
+      print_dict(chat_result, 'Chats:', 'Number of times each user used the chat', True, top=top)
+
+  if deaths:
+    death_result = results.get_deaths()
+    if not outname:
+      print_dict(death_result, 'Deaths:', 'Number of Deaths for each user', True, top=top)
+      print_dict(results.death_causes, 'Death Causes:', 'Number of Deaths for each cause', True, top=top)
+
+  if logins:
+    login_result = results.get_logins()
+    if not outname:
+      print_dict(login_result, 'Logins:', 'Number of Logins of each user', True, top=top)
+
+  if online_time:
+    online_time_result = results.get_online_time(include_online)
+    if not outname:
+      print_dict(online_time_result, 'Online-Time:', 'Time each user was online.', True, top=top)
+
+  if by_logins:
+    if chat:
+      # chats by login
+      chat_by_logins = results.get_by_logins(results.chat_counts)
+      print_dict(chat_by_logins, 'Chats by Logins:', 'Number of times each user used the chat by number of logins.', sorted_by_value=True, top=top)
+    if deaths:
+      # deaths by login
+      deaths_by_logins = results.get_by_logins(results.death_counts)
+      print_dict(deaths_by_logins, 'Deaths by Logins:', 'Number of times each user died by number of logins.', sorted_by_value=True, top=top)
+
+  if by_time:
+    if chat:
+      # time by chat
+      time_by_chat = results.get_by_time(results.chat_counts, include_online)
+      print_dict(time_by_chat, 'Time by Chat', 'Time each user was online by chat message.', sorted_by_value=True, top=top)
+    if deaths:
+      # time by death
+      time_by_death = results.get_by_time(results.death_counts, include_online)
+      print_dict(time_by_death, 'Time by Death', 'Time each user was online by Death.', sorted_by_value=True, top=top)
+    if logins:
+      # time by login
+      time_by_login = results.get_by_time(results.login_counts, include_online)
+      print_dict(time_by_login, 'Time by Login', 'Time each user was online by login.', sorted_by_value=True, top=top)
+
+  if results.intervals is not None and not outname:
+    for name, title, description, values in concurrency_sections(results, include_online):
+      print_dict(values, title + ':', description, True, top=top)
+
+  series = []
+  if results.daily is not None:
+    series = daily_series(results.get_daily(include_online))
+    if not outname:
+      for name, title, description, values in daily_sections(results, include_online):
+        print_dict(values, title + ':', description, True, top=top)
+      for name, title, description, values in series:
+        print_dict(values, title + ':', description, False)
+
+  if results.sketches is not None and not outname:
+    for name, title, description, values in sketch_sections(results, include_online):
+      print_dict(values, title + ':', description, True, top=top)
+
+  if servers and not outname:
+    for name, title, description, values in result_sections(results, chat, deaths, logins, online_time, by_logins, by_time, include_online, servers):
+      if '.' in name:
+        print_dict(values, title + ':', description, True, top=top)
+
+  if outname:
+    sections = []
+    for name, title, description, values in result_sections(results, chat, deaths, logins, online_time, by_logins, by_time, include_online, servers):
+      sections.append(new_section(title, description, values, top))
+      if top is not None:
+        for page, body in enumerate(json_pages(title, description, values, top)):
+          page_file = open('%s-%s-%d.json' % (os.path.splitext(outname)[0], name, page + 1), 'w')
+          page_file.write(body)
+          page_file.close()
+    for name, title, description, values in series:
+      sections.append(new_chart(title, description, values))
+    if results.daily is not None:
+      daily_file = open(os.path.splitext(outname)[0] + '-daily.json', 'w')
+      daily_file.write(daily_table(results, include_online))
+      daily_file.close()
+    content = { "title": _NAME, "generator": _NAME, "generated_at" : datetime.datetime.now().ctime(),"sections" : sections }
+
+    # write to a temporary file first, s.t. the output is never seen half written (see --follow)
+    output_file = open(outname + '.tmp', 'w')
+    output_file.write(render_html(content))
+    output_file.close()
+    os.rename(outname + '.tmp', outname)
+  return
+
 
 # >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-< >-<
 
@@ -632,8 +3581,26 @@ def main():
   deaths      = False
   logins      = False
   online_time = False
-  write       = False
   outname     = ''
+  cache       = None
+  jobs        = 1
+  follow      = None
+  interval    = 10
+  store       = None
+  threads     = 0
+  serve       = None
+  top         = None
+  servers     = []
+  profile     = None
+  cprofile    = None
+  show_timing = False
+  intervals   = False
+  daily       = False
+  sketches    = False
+  since       = None
+  until       = None
+  search      = None
+  player      = None
   # input arguments
   args = sys.argv[1:]
   if not args:
@@ -647,7 +3614,6 @@ def main():
     print_help()
 
   if '--write' in args:
-    write = True
     index = args.index('--write')
     outname = os.path.abspath(args[index + 1])
     if os.path.isfile(outname) & verbose:
@@ -655,6 +3621,137 @@ def main():
     del args[index+1] # outname
     del args[index] # --write
 
+  if '--cache' in args:
+    index = args.index('--cache')
+    cache = os.path.abspath(args[index + 1])
+    del args[index+1] # cachefile
+    del args[index] # --cache
+
+  if '--patterns' in args:
+    index = args.index('--patterns')
+    patterns = os.path.abspath(args[index + 1])
+    del args[index+1] # patternfile
+    del args[index] # --patterns
+    if not os.path.isfile(patterns):
+      print FontStyle.red + patterns + ' is not a file\n' + FontStyle.normal
+      print_help()
+    set_patterns_file(patterns)
+
+  if '--jobs' in args:
+    index = args.index('--jobs')
+    jobs = int(args[index + 1])
+    del args[index+1] # number of jobs
+    del args[index] # --jobs
+
+  if '--follow' in args:
+    index = args.index('--follow')
+    follow = args[index + 1]
+    del args[index+1] # logfile
+    del args[index] # --follow
+
+  if '--interval' in args:
+    index = args.index('--interval')
+    interval = float(args[index + 1])
+    del args[index+1] # seconds
+    del args[index] # --interval
+
+  if '--store' in args:
+    index = args.index('--store')
+    store = os.path.abspath(args[index + 1])
+    del args[index+1] # directory
+    del args[index] # --store
+
+  if '--since' in args:
+    index = args.index('--since')
+    since = parse_date(args[index + 1])
+    del args[index+1] # date
+    del args[index] # --since
+
+  if '--until' in args:
+    index = args.index('--until')
+    until = args[index + 1]
+    if ' ' in until:
+      until = parse_date(until)
+    else:
+      # a date includes the whole day
+      until = parse_date(until) + 86400
+    del args[index+1] # date
+    del args[index] # --until
+
+  if '--search' in args:
+    index = args.index('--search')
+    search = args[index + 1]
+    del args[index+1] # words
+    del args[index] # --search
+
+  if '--player' in args:
+    index = args.index('--player')
+    player = args[index + 1]
+    del args[index+1] # name
+    del args[index] # --player
+
+  if '--serve' in args:
+    index = args.index('--serve')
+    serve = int(args[index + 1])
+    del args[index+1] # port
+    del args[index] # --serve
+
+  while '--server' in args:
+    index = args.index('--server')
+    if '=' not in args[index + 1]:
+      print FontStyle.red + '--server needs name=logs\n' + FontStyle.normal
+      print_help()
+    name, logs = args[index + 1].split('=', 1)
+    servers.append((name, logs))
+    del args[index+1] # name=logs
+    del args[index] # --server
+
+  if '--profile' in args:
+    index = args.index('--profile')
+    profile = args[index + 1]
+    del args[index+1] # outputfile
+    del args[index] # --profile
+
+  if '--cprofile' in args:
+    index = args.index('--cprofile')
+    cprofile = args[index + 1]
+    del args[index+1] # dumpfile
+    del args[index] # --cprofile
+
+  if '--top' in args:
+    index = args.index('--top')
+    top = int(args[index + 1])
+    del args[index+1] # number of entries
+    del args[index] # --top
+    if top < 1:
+      print FontStyle.red + '--top needs at least one entry\n' + FontStyle.normal
+      print_help()
+
+  if '--threads' in args:
+    index = args.index('--threads')
+    threads = int(args[index + 1])
+    del args[index+1] # number of threads
+    del args[index] # --threads
+
+  if '--timing' in args:
+    show_timing = True
+    del args[args.index('--timing')]
+
+  if '--concurrency' in args:
+    intervals = True
+    online_time = True
+    del args[args.index('--concurrency')]
+
+  if '--daily' in args:
+    daily = True
+    online_time = True
+    del args[args.index('--daily')]
+
+  if '--sketches' in args:
+    sketches = True
+    online_time = True
+    del args[args.index('--sketches')]
+
   if '--verbose' in args:
     set_verbose(True)
     del args[args.index('--verbose')]
@@ -687,97 +3784,118 @@ def main():
 
   # this is just to test the regexes against a logfile
   if '--test' in args:
-    test_regexes()
-    exit(0)
+    # all are run, even if one fails
+    passed = test_regexes()
+    passed = test_sessions() and passed
+    passed = test_store() and passed
+    exit(0 if passed else 1)
 
-  if not args:
+  if not args and not follow and not store and not servers:
     print FontStyle.red + 'no files given\n' + FontStyle.normal
     print_help()
+  if (since is not None or until is not None) and not store:
+    print FontStyle.red + '--since and --until need --store\n' + FontStyle.normal
+    print_help()
+  if servers and (args or follow or store):
+    print FontStyle.red + '--server can not be used with other logfiles, --follow or --store\n' + FontStyle.normal
+    print_help()
+  if (search is not None or player is not None) and not store:
+    print FontStyle.red + '--search and --player need --store\n' + FontStyle.normal
+    print_help()
 
-  filenames = args
-  raw_data = read_logfiles(filenames)
-
-  # the chat data is not really needed in the normal log file, split chat into separate file
-  (chatless_data, chat_data) = purge_chat(raw_data)
-
-  if chat:
-    chat_result = process_chats(chat_data)
-    if not write:
-      print_dict(chat_result, 'Chats:', 'Number of times each user used the chat', True)
-
-  if deaths:
-    death_result = process_deaths(chatless_data)
-    if not write:
-      print_dict(death_result, 'Deaths:', 'Number of Deaths for each user', True)
-
-  if logins:
-    login_result = process_logins(chatless_data)
-    if not write:
-      print_dict(login_result, 'Logins:', 'Number of Logins of each user', True)
-
-  if online_time:
-    online_time_result = process_online_time(chatless_data)
-    if not write:
-      print_dict(online_time_result, 'Online-Time:', 'Time each user was online.', True)
-
-  if by_logins:
-    if chat:
-      # chats by login
-      chat_by_logins = process_by_login(chat_result, login_result)
-      print_dict(chat_by_logins, 'Chats by Logins:', 'Number of times each user used the chat by number of logins.', sorted_by_value=True)
-    if deaths:
-      # deaths by login
-      deaths_by_logins = process_by_login(death_result, login_result)
-      print_dict(deaths_by_logins, 'Deaths by Logins:', 'Number of times each user died by number of logins.', sorted_by_value=True)
+  if search is not None or player is not None:
+    # the given files are added to the store first, the statistics are not calculated
+    event_store, filenames = open_event_store(store, find_logfiles(args))
+    if filenames:
+      add_to_event_store(event_store, process_logfiles(filenames, cache=cache, jobs=jobs, record=True, threads=threads, state=event_store.state), filenames)
+      event_store.save(store)
+    print_chat(ChatIndex(store).search(search or '', player, since, until))
+    exit(0)
 
-  if by_time:
-    if chat:
-      # time by chat
-      time_by_chat = process_by_time(chat_result, online_time_result)
-      print_dict(time_by_chat, 'Time by Chat', 'Time each user was online by chat message.', sorted_by_value=True)
-    if deaths:
-      # time by death
-      time_by_death = process_by_time(death_result, online_time_result)
-      print_dict(time_by_death, 'Time by Death', 'Time each user was online by Death.', sorted_by_value=True)
-    if logins:
-      # time by login
-      time_by_login = process_by_time(login_result, online_time_result)
-      print_dict(time_by_login, 'Time by Login', 'Time each user was online by login.', sorted_by_value=True)
+  profiler = None
+  if cprofile:
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+  filenames = find_logfiles(args)
+  if follow:
+    # the followed logfile is read from its beginning by follow_logfile, i.e. when it is in a given directory as well
+    filenames = [filename for filename in filenames if os.path.realpath(filename) != os.path.realpath(follow)]
+
+  # all statistics are collected in a single pass over the logfiles, reading one line at a time
+  processing = 0
+  server_results = None
+  if servers:
+    start = time.time()
+    # the logs of each server may be given several times, i.e. as directory and pattern
+    names = []
+    server_logs = {}
+    for name, logs in servers:
+      if name not in server_logs:
+        names.append(name)
+        server_logs[name] = []
+      server_logs[name].append(logs)
+    server_results = process_servers([(name, find_logfiles(server_logs[name])) for name in names],
+                                     chat, deaths, logins, online_time, cache, jobs, False, threads, intervals, daily, sketches)
+    results = merge_servers(server_results)
+    processing = time.time() - start
+  elif store:
+    start = time.time()
+    # the given files are added to the events stored before, the statistics are calculated from all of them
+    event_store, new_files = open_event_store(store, filenames)
+    stored_before = bool(event_store.logfiles)
+    results = None
+    if new_files:
+      results = process_logfiles(new_files, chat, deaths, logins, online_time, cache, jobs, True, threads, intervals, daily, sketches, event_store.state)
+      add_to_event_store(event_store, results, new_files)
+      event_store.save(store)
+    if stored_before or not new_files or since is not None or until is not None:
+      results = event_store.query(since, until, intervals, daily, sketches)
+    processing = time.time() - start
+  else:
+    start = time.time()
+    results = process_logfiles(filenames, chat, deaths, logins, online_time, cache, jobs, False, threads, intervals, daily, sketches)
+    processing = time.time() - start
 
-  if write:
-    sections = []
-    content = { "title": _NAME, "generator": _NAME, "generated_at" : datetime.datetime.now().ctime(),"sections" : sections }
+  server = None
+  if serve is not None:
+    server = StatsServer(serve)
+    if verbose:
+      print 'serving statistics on port', serve
+
+  def update(include_online):
+    if server:
+      server.publish(results, chat, deaths, logins, online_time, by_logins, by_time, include_online, top, server_results)
+    if outname or not server:
+      report(results, outname, chat, deaths, logins, online_time, by_logins, by_time, include_online, top, server_results)
+
+  try:
+    if follow:
+      if server:
+        # requests are answered in the background, while the main thread follows the logfile
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+      if show_timing:
+        print_timing(processing)
+      follow_logfile(follow, results, interval, lambda: update(True))
+    else:
+      update(False)
+      if show_timing:
+        print_timing(processing)
+      if server:
+        server.serve_forever()
+  except KeyboardInterrupt:
+    pass
 
-    if chat:
-      sections.append(new_section('Chat', 'Number of times each user used the chat.', chat_result))
-    if deaths:
-      sections.append(new_section('Deaths', 'Number of times each user died.', death_result))
-    if logins:
-      sections.append(new_section('Logins', 'Number of times each user logged in.', login_result))
-    if online_time:
-      sections.append(new_section('Online Time', 'Time each user was online.',online_time_result))
-
-    if by_logins:
-      if chat:
-        # chats by login
-        sections.append(new_section('Chats by Logins', 'Number of times each user used the chat by number of logins.', chat_by_logins))
-      if deaths:
-        # deaths by login
-        sections.append(new_section('Deaths by Logins', 'Number of times each user died by number of logins.', deaths_by_logins))
-    if by_time:
-      if chat:
-        # time by chat
-        sections.append(new_section('Time by Chat', 'Time each user was online by chat message.', time_by_chat))
-      if deaths:
-        # time by death
-        sections.append(new_section('Time by Death', 'Time each user was online by Death.', time_by_death))
-      if logins:
-        # time by login
-        sections.append(new_section('Time by Login', 'Time each user was online by login.', time_by_login))
-
-    output_file = open(outname, 'w')
-    output_file.write(render_html(content))
-    output_file.close()
+  if profiler:
+    profiler.disable()
+    # the dump can be read with pstats, i.e. python -m pstats dumpfile
+    profiler.dump_stats(cprofile)
+  if profile:
+    profile_file = open(profile, 'w')
+    profile_file.write(timing.to_json())
+    profile_file.close()
 
 
 